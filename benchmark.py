@@ -0,0 +1,193 @@
+"""
+Замеры производительности решателя судоку на наборах головоломок разной сложности.
+
+Для каждого набора замеряется создание Sudoku, каждый метод решения (на только что созданной головоломке) и полное
+решение Sudoku.solve(). Результаты - количество головоломок в секунду и задержки p50/p99 - можно сохранить в файл
+и сравнить с ним результаты следующего запуска.
+
+Пример запуска:
+    python benchmark.py --output bench.json
+    python benchmark.py --compare bench.json --threshold 0.2
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+
+from sudoku_parser import iter_grids
+from sudoku_solver import Sudoku
+
+# Количество заполненных ячеек в сгенерированных наборах.
+GENERATED_GIVENS = {'easy': 40, 'medium': 30, 'hard': 24}
+
+# Головоломки, известные своей сложностью для логических методов или для перебора.
+PATHOLOGICAL = (
+    '800000000003600000070090200050007000000045700000100030001000068008500010090000400',
+    '000000000000003085001020000000507000004000100090000000500000073002010000000040009',
+)
+
+CORPORA = ('euler',) + tuple(GENERATED_GIVENS) + ('pathological',)
+
+TECHNIQUES = ('solve_naked_pairs', 'solve_hidden_pairs', 'solve_naked_singles', 'solve_hidden_singles',
+              'solve_intersection_removal', 'solve_x_wing', 'solve_naked_triples', 'solve_hidden_triples',
+              'solve_swordfish', 'solve_naked_quads', 'solve_hidden_quads', 'solve_jellyfish')
+
+
+def _euler_grids():
+    return [tuple(value for row in matrix for value in row) for matrix in iter_grids('p096_sudoku.txt')]
+
+
+def load_corpus(name, seed=0):
+    """
+    Возвращает набор головоломок - список кортежей из 81 значения.
+    :param name: string
+        Название набора: euler - 50 головоломок Project Euler, easy/medium/hard - головоломки, полученные
+        удалением случайных значений из решений головоломок Project Euler (единственность решения не
+        проверяется), pathological - заведомо сложные головоломки.
+    :param seed: integer
+        Начальное значение генератора случайных чисел для сгенерированных наборов.
+    """
+    if name == 'euler':
+        return _euler_grids()
+    if name == 'pathological':
+        return [tuple(int(ch) for ch in grid) for grid in PATHOLOGICAL]
+    if name not in GENERATED_GIVENS:
+        raise ValueError(f'Неизвестный набор головоломок: {name}')
+
+    rnd = random.Random(f'{name}-{seed}')
+    corpus = []
+    for grid in _euler_grids():
+        sudoku = Sudoku(grid)
+        sudoku.solve()
+        values = list(sudoku.values)
+        for pos in rnd.sample(range(81), 81 - GENERATED_GIVENS[name]):
+            values[pos] = 0
+        corpus.append(tuple(values))
+    return corpus
+
+
+def percentile(samples, q):
+    """Возвращает q-й процентиль (0 - 100) выборки методом ближайшего ранга."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def _summary(latencies):
+    total = sum(latencies)
+    return {
+        'count': len(latencies),
+        'seconds': total,
+        'puzzles_per_sec': len(latencies) / total if total else 0.0,
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+    }
+
+
+def _measure(func, repeat):
+    """Минимальное время выполнения функции из repeat запусков."""
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def bench_corpus(grids, repeat=3):
+    """
+    Замеряет производительность на наборе головоломок.
+    :param grids: list
+        Головоломки.
+    :param repeat: integer
+        Количество повторов каждого замера, в результат идет лучшее время.
+    :return: dict
+        Операция (init, solve и названия методов решения) -> сводка замеров.
+    """
+    latencies = {operation: [] for operation in ('init', 'solve') + TECHNIQUES}
+
+    for grid in grids:
+        latencies['init'].append(_measure(lambda: Sudoku(grid), repeat))
+
+        for technique in TECHNIQUES:
+            sudokus = [Sudoku(grid) for i in range(repeat)]
+            latencies[technique].append(_measure(lambda: getattr(sudokus.pop(), technique)(), repeat))
+
+        sudokus = [Sudoku(grid) for i in range(repeat)]
+        latencies['solve'].append(_measure(lambda: sudokus.pop().solve(), repeat))
+
+    return {operation: _summary(values) for operation, values in latencies.items()}
+
+
+def run(corpora=CORPORA, repeat=3, seed=0):
+    """Замеряет производительность на заданных наборах. Возвращает результаты в виде словаря."""
+    return {
+        'python': platform.python_version(),
+        'repeat': repeat,
+        'corpora': {name: bench_corpus(load_corpus(name, seed), repeat) for name in corpora},
+    }
+
+
+def compare(current, baseline, threshold=0.2):
+    """
+    Сравнивает результаты замеров с базовыми.
+    :param threshold: float
+        Допустимое относительное увеличение задержки p50.
+    :return: list
+        Описания регрессий.
+    """
+    regressions = []
+    for name, operations in current['corpora'].items():
+        for operation, summary in operations.items():
+            base = baseline.get('corpora', {}).get(name, {}).get(operation)
+            if not base or not base['p50']:
+                continue
+            ratio = summary['p50'] / base['p50']
+            if ratio > 1 + threshold:
+                regressions.append(f'{name}/{operation}: p50 {base["p50"] * 1e6:.1f} -> '
+                                   f'{summary["p50"] * 1e6:.1f} мкс (x{ratio:.2f})')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Замеры производительности решателя судоку.')
+    parser.add_argument('--corpus', nargs='+', choices=CORPORA, default=list(CORPORA), help='наборы головоломок')
+    parser.add_argument('--repeat', type=int, default=3, help='количество повторов каждого замера')
+    parser.add_argument('--seed', type=int, default=0, help='начальное значение для сгенерированных наборов')
+    parser.add_argument('--output', help='сохранить результаты в файл JSON')
+    parser.add_argument('--compare', help='сравнить с результатами из файла JSON')
+    parser.add_argument('--threshold', type=float, default=0.2, help='допустимое относительное замедление p50')
+    args = parser.parse_args(argv)
+
+    results = run(args.corpus, args.repeat, args.seed)
+
+    print(f'{"набор":<14}{"операция":<28}{"в секунду":>12}{"p50, мкс":>12}{"p99, мкс":>12}')
+    for name, operations in results['corpora'].items():
+        for operation, summary in operations.items():
+            print(f'{name:<14}{operation:<28}{summary["puzzles_per_sec"]:>12.1f}'
+                  f'{summary["p50"] * 1e6:>12.1f}{summary["p99"] * 1e6:>12.1f}')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f'РЕГРЕССИЯ {regression}')
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
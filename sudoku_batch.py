@@ -0,0 +1,284 @@
+"""
+Пакетное решение судоку из файла в нескольких процессах.
+
+Пример запуска:
+    python sudoku_batch.py p096_sudoku.txt --workers 4 --chunksize 16
+
+С хранилищем результатов (sudoku_store) повторный запуск решает только головоломки, которых в нем еще нет:
+    python sudoku_batch.py p096_sudoku.txt --store results.db
+"""
+import argparse
+import collections
+import itertools
+import multiprocessing
+import os
+import time
+
+from sudoku_loader import load_grids
+from sudoku_parser import iter_grids
+from sudoku_solver import NO_SOLUTION, SOLVED, Contradiction, SolveStats, Sudoku
+from sudoku_store import FINAL_STATUSES, ResultStore, grid_key
+
+# Результат решения одной головоломки: плоский список из 81 значения (построчно), признак полного решения и
+# состояние решения (sudoku_solver.SOLVED и т.п.).
+GridResult = collections.namedtuple('GridResult', ['values', 'solved', 'status'])
+
+# Результат пакетного решения: результаты в порядке головоломок во входном файле, статистика по процессам
+# (pid -> WorkerStats), общее время работы в секундах, статистика методов решения (SolveStats либо None) и
+# количество результатов, взятых из хранилища.
+BatchResult = collections.namedtuple('BatchResult', ['results', 'workers', 'elapsed', 'stats', 'stored'])
+
+# Количество новых результатов, записываемых в хранилище одной транзакцией.
+STORE_BATCH = 4096
+
+
+class WorkerStats:
+    """
+    Статистика работы процесса.
+
+    Атрибуты
+    --------
+    puzzles: integer
+        Количество решенных процессом головоломок.
+    seconds: float
+        Суммарное время решения в секундах.
+    """
+    def __init__(self):
+        self.puzzles = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return f'WorkerStats(puzzles={self.puzzles}, seconds={self.seconds:.3f}, throughput={self.throughput:.1f})'
+
+    @property
+    def throughput(self):
+        """Количество головоломок в секунду."""
+        return self.puzzles / self.seconds if self.seconds else 0.0
+
+
+def solve_grid(matrix, stats=None, timeout=None):
+    """
+    Решает одну головоломку.
+    :param matrix: list
+        Матрица 9x9 либо плоская последовательность из 81 значения ячеек.
+    :param stats: SolveStats
+        Сборщик статистики решения.
+    :param timeout: float
+        Наибольшее время решения в секундах. Головоломка, не решенная за это время, возвращается нерешенной.
+    :return: GridResult
+        Головоломка с повторяющимся значением в блоке возвращается нерешенной с состоянием NO_SOLUTION.
+    """
+    try:
+        sudoku = Sudoku(matrix, stats)
+    except Contradiction:
+        values = list(matrix) if isinstance(matrix[0], int) else [value for row in matrix for value in row]
+        return GridResult(values, False, NO_SOLUTION)
+    status = sudoku.solve(timeout=timeout).status
+    return GridResult(list(sudoku.values), status == SOLVED, status)
+
+
+def _solve_chunk(chunk, collect_stats=False, timeout=None):
+    """
+    Решает группу головоломок. Возвращает pid процесса, время решения, список результатов, список времен решения
+    каждой головоломки и статистику методов решения (либо None).
+    """
+    stats = SolveStats() if collect_stats else None
+    results = []
+    timings = []
+    start = time.perf_counter()
+    for matrix in chunk:
+        grid_start = time.perf_counter()
+        results.append(solve_grid(matrix, stats, timeout))
+        timings.append(time.perf_counter() - grid_start)
+    return os.getpid(), time.perf_counter() - start, results, timings, stats
+
+
+def _chunks(iterable, size):
+    """Разбивает последовательность на списки длиной size."""
+    iterator = iter(iterable)
+    chunk = list(itertools.islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(itertools.islice(iterator, size))
+
+
+def _lookup(chunk, store):
+    """
+    Ищет результаты группы головоломок в хранилище. Возвращает ключи головоломок, список результатов (None для
+    головоломок, которые нужно решить) и список головоломок, которые нужно решить.
+    """
+    keys = [grid_key(grid) for grid in chunk]
+    found = store.get_many(keys)
+    stored = []
+    todo = []
+    for key, grid in zip(keys, chunk):
+        record = found.get(key)
+        if record is not None and record.status in FINAL_STATUSES:
+            stored.append(GridResult(record.values, record.status == SOLVED, record.status))
+        else:
+            stored.append(None)
+            todo.append(grid)
+    return keys, stored, todo
+
+
+def _collect(chunk_result, workers, results, stats, keys=None, stored=None, records=None):
+    """
+    Добавляет результаты решения группы головоломок к общим результатам и статистике. Если группа прошла через
+    хранилище (_lookup), решенные головоломки встают на места None в stored, а их результаты добавляются в records
+    для записи в хранилище.
+    """
+    if chunk_result is not None:
+        pid, seconds, chunk, timings, chunk_stats = chunk_result
+        workers[pid].puzzles += len(chunk)
+        workers[pid].seconds += seconds
+        if chunk_stats is not None:
+            stats.merge(chunk_stats)
+    else:
+        chunk = timings = ()
+
+    if stored is None:
+        results.extend(chunk)
+        return
+
+    solved = iter(zip(chunk, timings))
+    for key, result in zip(keys, stored):
+        if result is None:
+            result, elapsed = next(solved)
+            records.append((key, result.values, result.status, elapsed))
+        results.append(result)
+
+
+def solve_grids(grids, workers=None, chunksize=64, collect_stats=False, timeout=None, store=None):
+    """
+    Решает головоломки в пуле процессов.
+    :param grids: iterable
+        Головоломки - матрицы 9x9 либо плоские последовательности из 81 значения ячеек.
+    :param workers: integer
+        Количество процессов. По умолчанию - количество процессоров. При workers=1 решение выполняется в текущем
+        процессе.
+    :param chunksize: integer
+        Количество головоломок, передаваемых процессу за один раз.
+    :param collect_stats: bool
+        Собирать статистику методов решения.
+    :param timeout: float
+        Наибольшее время решения одной головоломки в секундах.
+    :param store: sudoku_store.ResultStore
+        Хранилище результатов. Головоломки с окончательным результатом в хранилище (FINAL_STATUSES) не решаются
+        повторно, результаты остальных записываются в хранилище группами по STORE_BATCH.
+    :return: BatchResult
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1 or chunksize < 1:
+        raise ValueError('Количество процессов и размер группы должны быть положительными')
+
+    start = time.perf_counter()
+    results = []
+    worker_stats = collections.defaultdict(WorkerStats)
+    stats = SolveStats() if collect_stats else None
+    records = []
+
+    def collect(chunk_result, keys, stored):
+        _collect(chunk_result, worker_stats, results, stats, keys, stored, records)
+        if len(records) >= STORE_BATCH:
+            store.put_many(records)
+            records.clear()
+
+    def chunks():
+        # группы головоломок, которые нужно решить, с ключами и результатами из хранилища
+        for chunk in _chunks(grids, chunksize):
+            if store is None:
+                yield chunk, None, None
+            else:
+                keys, stored, chunk = _lookup(chunk, store)
+                yield chunk, keys, stored
+
+    try:
+        if workers == 1:
+            for chunk, keys, stored in chunks():
+                collect(_solve_chunk(chunk, collect_stats, timeout) if chunk else None, keys, stored)
+        else:
+            with multiprocessing.Pool(workers) as pool:
+                # Группы забираются в порядке отправки, поэтому порядок результатов совпадает с входным. Число
+                # групп в работе ограничено, чтобы входной поток не вычитывался в память целиком.
+                pending = collections.deque()
+                for chunk, keys, stored in chunks():
+                    job = None
+                    if chunk:
+                        # memoryview (элементы sudoku_loader.GridArray) не сериализуется для передачи в процесс
+                        chunk = [bytes(grid) if isinstance(grid, memoryview) else grid for grid in chunk]
+                        job = pool.apply_async(_solve_chunk, (chunk, collect_stats, timeout))
+                    pending.append((job, keys, stored))
+                    if len(pending) >= 2 * workers:
+                        job, keys, stored = pending.popleft()
+                        collect(job.get() if job is not None else None, keys, stored)
+                while pending:
+                    job, keys, stored = pending.popleft()
+                    collect(job.get() if job is not None else None, keys, stored)
+    finally:
+        # результаты, полученные до ошибки или прерывания, не теряются для следующего запуска
+        if records:
+            store.put_many(records)
+
+    stored_count = len(results) - sum(worker.puzzles for worker in worker_stats.values())
+    return BatchResult(results, dict(worker_stats), time.perf_counter() - start, stats, stored_count)
+
+
+def solve_file(path, workers=None, chunksize=64, use_mmap=False, collect_stats=False, timeout=None, store=None):
+    """
+    Решает все головоломки из файла в пуле процессов. Файл читается потоково, форматы описаны в sudoku_parser.
+    :param path: string
+        Путь к файлу.
+    :param workers: integer
+        Количество процессов. По умолчанию - количество процессоров.
+    :param chunksize: integer
+        Количество головоломок, передаваемых процессу за один раз.
+    :param use_mmap: bool
+        Загрузить файл целиком через sudoku_loader.load_grids (только формат "81 символ в строке").
+    :param collect_stats: bool
+        Собирать статистику методов решения.
+    :param timeout: float
+        Наибольшее время решения одной головоломки в секундах.
+    :param store: sudoku_store.ResultStore
+        Хранилище результатов, см. solve_grids.
+    :return: BatchResult
+    """
+    grids = load_grids(path) if use_mmap else iter_grids(path)
+    return solve_grids(grids, workers, chunksize, collect_stats, timeout, store)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Пакетное решение судоку в нескольких процессах.')
+    parser.add_argument('path', help='файл с головоломками')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='количество процессов')
+    parser.add_argument('-c', '--chunksize', type=int, default=64, help='размер группы головоломок')
+    parser.add_argument('--mmap', action='store_true',
+                        help='загрузить файл через отображение в память (формат "81 символ в строке")')
+    parser.add_argument('--stats', action='store_true', help='вывести статистику методов решения в формате JSON')
+    parser.add_argument('-t', '--timeout', type=float, default=None,
+                        help='наибольшее время решения одной головоломки в секундах')
+    parser.add_argument('--store', default=None,
+                        help='файл хранилища результатов: уже решенные головоломки не решаются повторно')
+    args = parser.parse_args(argv)
+
+    if args.store is not None:
+        with ResultStore(args.store) as store:
+            batch = solve_file(args.path, args.workers, args.chunksize, args.mmap, args.stats, args.timeout, store)
+    else:
+        batch = solve_file(args.path, args.workers, args.chunksize, args.mmap, args.stats, args.timeout)
+    solved = sum(result.solved for result in batch.results)
+    total = len(batch.results)
+
+    print(f'Решено {solved} судоку из {total} за {batch.elapsed:.3f} с '
+          f'({total / batch.elapsed if batch.elapsed else 0:.1f} в секунду)')
+    if args.store is not None:
+        print(f'  из хранилища: {batch.stored} судоку')
+    for pid, worker in sorted(batch.workers.items()):
+        print(f'  процесс {pid}: {worker.puzzles} судоку за {worker.seconds:.3f} с '
+              f'({worker.throughput:.1f} в секунду)')
+    if batch.stats is not None:
+        print(batch.stats.to_json(indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+"""
+Кэш решений судоку с приведением головоломок к каноническому виду.
+
+Головоломки, получающиеся друг из друга перестановкой цифр, перестановками строк внутри полос и столбцов внутри
+стеков, перестановками полос и стеков и транспонированием, имеют общий канонический вид. Решение хранится в кэше
+для канонического вида и переводится обратно для каждой эквивалентной головоломки.
+
+Приведение к каноническому виду дороже решения головоломки, поэтому кэш сначала ищет головоломку в точности в том
+виде, в котором она передана, и приводит ее к каноническому виду только при промахе. Разреженные головоломки
+(меньше MIN_GIVENS значений) к каноническому виду не приводятся: для них приведение дороже решения в десятки раз,
+а на почти пустой сетке занимает секунды. Такие головоломки кэшируются только в исходном виде.
+"""
+import collections
+import itertools
+import shelve
+
+from sudoku_solver import Contradiction, Sudoku
+
+# Преобразование головоломки: cells[k] - позиция исходной ячейки, значение которой попадает в ячейку k
+# канонического вида, digits[d] - новое обозначение цифры d (digits[0] == 0).
+Transform = collections.namedtuple('Transform', ['cells', 'digits'])
+
+# Предельное число рассматриваемых вариантов на каждом шаге поиска канонического вида. Превышение возможно только
+# для почти пустых или сильно симметричных головоломок; тогда результат - эквивалентная, но, возможно,
+# не минимальная головоломка, что снижает долю попаданий в кэш, но не влияет на корректность ответов.
+MAX_CANDIDATES = 1 << 14
+
+# Наименьшее количество заполненных ячеек головоломки, приводимой к каноническому виду.
+MIN_GIVENS = 22
+
+
+def _flatten(grid):
+    """Возвращает кортеж из 81 значения ячеек для матрицы 9x9 либо плоской последовательности."""
+    if len(grid) == 81:
+        return tuple(grid)
+    return tuple(value for row in grid for value in row)
+
+
+def _key(values):
+    """Ключ кэша - строка из 81 цифры. Решение, хранимое по ключу, - решение головоломки, записанной этим ключом."""
+    return ''.join(map(str, values))
+
+
+def _best_column_orders(row):
+    """
+    Возвращает порядки столбцов, при которых строка в каноническом виде минимальна. Значения в строке различны,
+    поэтому после переобозначения цифр строка определяется только расположением пустых ячеек, которые должны
+    стоять как можно раньше.
+    :param row: tuple
+        Значения 9 ячеек строки.
+    """
+    zeros = [[c for c in range(3 * s, 3 * s + 3) if row[c] == 0] for s in range(3)]
+    others = [[c for c in range(3 * s, 3 * s + 3) if row[c] != 0] for s in range(3)]
+
+    stack_orders = [order for order in itertools.permutations(range(3))
+                    if len(zeros[order[0]]) >= len(zeros[order[1]]) >= len(zeros[order[2]])]
+    inner_orders = [[z + o for z in itertools.permutations(zeros[s]) for o in itertools.permutations(others[s])]
+                    for s in range(3)]
+
+    for order in stack_orders:
+        for first, second, third in itertools.product(*(inner_orders[s] for s in order)):
+            yield first + second + third
+
+
+def _relabel(grid, row, cols, digits, next_digit, bound):
+    """
+    Переобозначает цифры строки в порядке первого появления.
+    :param bound: tuple
+        Лучшая из найденных строк либо None. Если строка оказывается больше нее, обработка прерывается.
+    :return: tuple
+        Строка, обозначения цифр и следующая метка либо None, если строка больше bound.
+    """
+    result = []
+    equal = bound is not None
+    for i, c in enumerate(cols):
+        value = grid[9 * row + c]
+        if value:
+            if not digits[value]:
+                digits = digits[:value] + (next_digit,) + digits[value + 1:]
+                next_digit += 1
+            value = digits[value]
+        if equal and value != bound[i]:
+            if value > bound[i]:
+                return None
+            equal = False
+        result.append(value)
+    return tuple(result), digits, next_digit
+
+
+def _next_rows(rows):
+    """Строки, которые могут следовать за уже выбранными с сохранением структуры полос."""
+    if len(rows) % 3:
+        band = rows[-1] // 3
+        return [r for r in range(3 * band, 3 * band + 3) if r not in rows]
+    used = {r // 3 for r in rows}
+    return [r for r in range(9) if r // 3 not in used]
+
+
+def canonicalize(grid):
+    """
+    Приводит головоломку к каноническому виду - лексикографически минимальной головоломке среди эквивалентных,
+    в которой цифры переобозначены в порядке первого появления.
+    :param grid: list
+        Матрица 9x9 либо плоская последовательность из 81 значения ячеек.
+    :return: tuple
+        Канонический вид (кортеж из 81 значения) и преобразование Transform.
+    """
+    original = _flatten(grid)
+    transposed = tuple(original[9 * (pos % 9) + pos // 9] for pos in range(81))
+    grids = (original, transposed)
+
+    # Вариант: (транспонирование, выбранные строки, порядок столбцов, обозначения цифр, следующая метка).
+    best = None
+    candidates = []
+    for t, g in enumerate(grids):
+        for r in range(9):
+            for cols in _best_column_orders(g[9 * r:9 * r + 9]):
+                relabeled = _relabel(g, r, cols, (0,) * 10, 1, best)
+                if relabeled is None:
+                    break
+                line, digits, next_digit = relabeled
+                if best is None or line < best:
+                    best = line
+                    candidates = []
+                if line == best and len(candidates) < MAX_CANDIDATES:
+                    candidates.append((t, (r,), cols, digits, next_digit))
+
+    canonical = list(best)
+    for level in range(1, 9):
+        best = None
+        refined = []
+        for t, rows, cols, digits, next_digit in candidates:
+            for r in _next_rows(rows):
+                relabeled = _relabel(grids[t], r, cols, digits, next_digit, best)
+                if relabeled is None:
+                    continue
+                line, new_digits, new_next = relabeled
+                if best is None or line < best:
+                    best = line
+                    refined = []
+                if line == best and len(refined) < MAX_CANDIDATES:
+                    refined.append((t, rows + (r,), cols, new_digits, new_next))
+        canonical.extend(best)
+        candidates = refined
+
+    t, rows, cols, digits, next_digit = candidates[0]
+    # Цифры, отсутствующие в головоломке, обозначаются оставшимися метками по возрастанию.
+    digits = list(digits)
+    for value in range(1, 10):
+        if not digits[value]:
+            digits[value] = next_digit
+            next_digit += 1
+
+    cells = []
+    for r in rows:
+        for c in cols:
+            cells.append(9 * c + r if t else 9 * r + c)
+
+    return tuple(canonical), Transform(tuple(cells), tuple(digits))
+
+
+def apply_transform(grid, transform):
+    """Применяет преобразование к головоломке (или решению). Возвращает кортеж из 81 значения."""
+    values = _flatten(grid)
+    return tuple(transform.digits[values[pos]] for pos in transform.cells)
+
+
+def invert_transform(grid, transform):
+    """Переводит головоломку (или решение) из канонического вида обратно. Возвращает кортеж из 81 значения."""
+    values = _flatten(grid)
+    inverse_digits = [0] * 10
+    for value, digit in enumerate(transform.digits):
+        inverse_digits[digit] = value
+
+    result = [0] * 81
+    for k, pos in enumerate(transform.cells):
+        result[pos] = inverse_digits[values[k]]
+    return tuple(result)
+
+
+class SolutionCache:
+    """
+    Ограниченный по размеру кэш решений с вытеснением давно не использованных записей (LRU).
+
+    Атрибуты
+    --------
+    maxsize: integer
+        Наибольшее число решений в памяти.
+    hits: integer
+        Количество найденных в кэше решений.
+    misses: integer
+        Количество решений, вычисленных заново.
+    """
+    def __init__(self, maxsize=10000, path=None):
+        """
+        :param maxsize: integer
+            Наибольшее число решений в памяти.
+        :param path: string
+            Путь к файлу хранилища (shelve), сохраняющего решения между запусками. По умолчанию решения хранятся
+            только в памяти.
+        """
+        if maxsize < 1:
+            raise ValueError('Размер кэша должен быть положительным')
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._solutions = collections.OrderedDict()
+        self._store = shelve.open(path) if path is not None else None
+
+    def __len__(self):
+        return len(self._solutions)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Закрывает хранилище на диске."""
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    def _get(self, key):
+        solution = self._solutions.get(key)
+        if solution is not None:
+            self._solutions.move_to_end(key)
+        elif self._store is not None and key in self._store:
+            solution = self._store[key]
+            self._put(key, solution, persist=False)
+        return solution
+
+    def _put(self, key, solution, persist=True):
+        self._solutions[key] = solution
+        self._solutions.move_to_end(key)
+        if len(self._solutions) > self.maxsize:
+            self._solutions.popitem(last=False)
+        if persist and self._store is not None:
+            self._store[key] = solution
+
+    def _lookup(self, values):
+        """
+        Ищет решение головоломки: сначала в исходном виде, затем в каноническом. Возвращает ключ головоломки,
+        решение либо None и результат canonicalize (None, если головоломка не приводилась к каноническому виду).
+        """
+        key = _key(values)
+        solution = self._get(key)
+        if solution is not None or len(values) - values.count(0) < MIN_GIVENS:
+            return key, solution, None
+
+        canonical = canonicalize(values)
+        solution = self._get(_key(canonical[0]))
+        if solution is not None:
+            solution = invert_transform(solution, canonical[1])
+            # повторный запрос той же головоломки обойдется без приведения к каноническому виду
+            self._put(key, solution)
+        return key, solution, canonical
+
+    def _remember(self, key, canonical, solution):
+        """Сохраняет решение по ключу головоломки и, если она приводилась к каноническому виду, по ключу
+        канонического вида."""
+        if canonical is not None:
+            canonical, transform = canonical
+            self._put(_key(canonical), apply_transform(solution, transform))
+        self._put(key, tuple(solution))
+
+    def get(self, grid):
+        """
+        Возвращает решение головоломки из кэша.
+        :param grid: list
+            Матрица 9x9 либо плоская последовательность из 81 значения ячеек.
+        :return: tuple
+            Решение (81 значение) либо None, если решения нет в кэше.
+        """
+        return self._lookup(_flatten(grid))[1]
+
+    def put(self, grid, solution):
+        """
+        Сохраняет решение головоломки в кэше.
+        :param grid: list
+            Матрица 9x9 либо плоская последовательность из 81 значения ячеек.
+        :param solution: list
+            Решение - матрица 9x9 либо плоская последовательность из 81 значения.
+        """
+        values = _flatten(grid)
+        canonical = canonicalize(values) if len(values) - values.count(0) >= MIN_GIVENS else None
+        self._remember(_key(values), canonical, _flatten(solution))
+
+    def solve(self, grid):
+        """
+        Решает головоломку, используя кэш.
+        :param grid: list
+            Матрица 9x9 либо плоская последовательность из 81 значения ячеек.
+        :return: tuple
+            Решение (81 значение) либо None, если головоломка не решена.
+        """
+        values = _flatten(grid)
+        key, solution, canonical = self._lookup(values)
+        if solution is not None:
+            self.hits += 1
+            return solution
+
+        self.misses += 1
+        try:
+            sudoku = Sudoku(grid)
+        except Contradiction:
+            return None
+        sudoku.solve()
+        if sudoku.unsolved_cells:
+            return None
+
+        self._remember(key, canonical, sudoku.values)
+        return tuple(sudoku.values)
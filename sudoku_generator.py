@@ -0,0 +1,214 @@
+"""
+Генерация головоломок судоку с единственным решением.
+
+Сначала случайным поиском строится заполненная сетка, затем из нее удаляются значения, пока решение остается
+единственным. Сложность головоломки определяется по методам, которые потребовались Sudoku.solve().
+
+Пример запуска:
+    python sudoku_generator.py --count 1000 --grade medium --seed 1 > puzzles.txt
+"""
+import argparse
+import collections
+import random
+
+from sudoku_solver import COLUMN_OF, DIGIT_BITS, FULL_MASK, LOWEST_BIT, PEERS, ROW_OF, Contradiction, Sudoku
+
+# Уровни сложности в порядке возрастания.
+GRADES = ('easy', 'medium', 'hard', 'expert')
+
+# Уровень сложности, который задает головоломке применение метода решения. Методы перечислены в порядке
+# TechniqueScheduler.default(); головоломка, не решаемая логическими методами, имеет уровень expert.
+TECHNIQUE_GRADES = {
+    'solve_naked_singles': 'easy',
+    'solve_hidden_singles': 'easy',
+    'solve_naked_pairs': 'easy',
+    'solve_hidden_pairs': 'medium',
+    'solve_intersection_removal': 'medium',
+    'solve_x_wing': 'medium',
+    'solve_naked_triples': 'hard',
+    'solve_hidden_triples': 'hard',
+    'solve_swordfish': 'hard',
+    'solve_naked_quads': 'hard',
+    'solve_hidden_quads': 'hard',
+    'solve_jellyfish': 'hard',
+}
+
+# Сгенерированная головоломка: значения ячеек (кортеж из 81 значения, 0 - пустая ячейка), решение и уровень
+# сложности.
+GeneratedPuzzle = collections.namedtuple('GeneratedPuzzle', ['grid', 'solution', 'grade'])
+
+
+def grade(grid):
+    """
+    Определяет уровень сложности головоломки.
+    :param grid: list
+        Матрица 9x9 либо плоская последовательность из 81 значения ячеек.
+    :return: string
+        Один из GRADES.
+    """
+    result = Sudoku(grid).solve(search=False)
+    if result.status != 'solved':
+        return 'expert'
+    return GRADES[max((GRADES.index(TECHNIQUE_GRADES[technique]) for technique in result.techniques), default=0)]
+
+
+def _fill(sudoku, rnd):
+    """
+    Заполняет головоломку поиском с возвратом, перебирая кандидатов в случайном порядке. Из логических методов
+    применяются только одиночки: на почти пустой сетке остальные методы не окупаются.
+    """
+    try:
+        sudoku._propagate_singles()
+    except Contradiction:
+        return False
+    if sudoku.unsolved_cells == 0:
+        return True
+
+    pos, _ = sudoku._choose_cell()
+    digits = []
+    choices = sudoku.masks[pos]
+    while choices:
+        digits.append(LOWEST_BIT[choices] + 1)
+        choices &= choices - 1
+    rnd.shuffle(digits)
+
+    snapshot = sudoku.snapshot()
+    for digit in digits:
+        try:
+            sudoku.set_value(ROW_OF[pos], COLUMN_OF[pos], digit)
+            if _fill(sudoku, rnd):
+                return True
+        except Contradiction:
+            pass
+        sudoku.restore(snapshot)
+    return False
+
+
+def random_solution(rnd=random):
+    """
+    Строит случайную заполненную сетку.
+    :param rnd: random.Random
+        Генератор случайных чисел.
+    :return: tuple
+        81 значение ячеек.
+    """
+    sudoku = Sudoku([0] * 81)
+    _fill(sudoku, rnd)
+    return tuple(sudoku.values)
+
+
+def _forced(grid, pos, value):
+    """Проверяет, что значения соседей ячейки исключают все цифры, кроме value."""
+    used = 0
+    for peer in PEERS[pos]:
+        used |= DIGIT_BITS[grid[peer]]
+    return used | DIGIT_BITS[value] == FULL_MASK
+
+
+def _unique(grid, solution, removed):
+    """
+    Проверяет, что головоломка grid, полученная удалением значений из головоломки с единственным решением
+    solution, по-прежнему имеет единственное решение. removed - удаленные ячейки, в которых другое решение может
+    отличаться от solution. Другое решение обязано отличаться от solution в
+    одной из удаленных ячеек, поэтому достаточно убедиться, что таких решений нет: для каждой удаленной ячейки
+    ищется решение, в котором ее значение отличается от solution, а в предыдущих удаленных ячейках совпадает.
+    """
+    sudoku = Sudoku(grid)
+    snapshot = sudoku.snapshot()
+    for cell in removed:
+        try:
+            sudoku._eliminate(cell, DIGIT_BITS[solution[cell]])
+        except Contradiction:
+            # цифра из solution - единственная возможная в ячейке
+            pass
+        else:
+            if sudoku.count_solutions(1):
+                return False
+        sudoku.restore(snapshot)
+        sudoku.set_value(ROW_OF[cell], COLUMN_OF[cell], solution[cell])
+        snapshot = sudoku.snapshot()
+    return True
+
+
+def dig(solution, rnd=random, symmetric=True, max_grade=None):
+    """
+    Удаляет значения из заполненной сетки в случайном порядке, пока решение остается единственным. Если значения
+    удаленных ячеек однозначно следуют из значений их соседей, единственность и сложность сохраняются без
+    проверки; поиском проверяются только остальные удаленные ячейки.
+    :param solution: tuple
+        81 значение заполненной сетки.
+    :param rnd: random.Random
+        Генератор случайных чисел.
+    :param symmetric: bool
+        Удалять значения парами ячеек, симметричных относительно центра.
+    :param max_grade: string
+        Наибольший допустимый уровень сложности: удаление, после которого головоломка становится сложнее,
+        отменяется.
+    :return: list
+        81 значение головоломки.
+    """
+    grid = list(solution)
+    limit = GRADES.index(max_grade) if max_grade is not None else len(GRADES) - 1
+
+    cells = list(range(41 if symmetric else 81))
+    rnd.shuffle(cells)
+    for pos in cells:
+        removed = {pos, 80 - pos} if symmetric else {pos}
+        for cell in removed:
+            grid[cell] = 0
+
+        # значения, следующие из значений соседей, не могут отличаться в другом решении
+        unforced = [cell for cell in removed if not _forced(grid, cell, solution[cell])]
+        if not unforced:
+            continue
+        if not _unique(grid, solution, unforced) or \
+                (limit < len(GRADES) - 1 and GRADES.index(grade(grid)) > limit):
+            for cell in removed:
+                grid[cell] = solution[cell]
+
+    return grid
+
+
+def generate(target=None, rnd=random, symmetric=True, max_attempts=100):
+    """
+    Генерирует головоломку с единственным решением.
+    :param target: string
+        Требуемый уровень сложности (один из GRADES). По умолчанию - любой.
+    :param rnd: random.Random
+        Генератор случайных чисел.
+    :param symmetric: bool
+        Расположение заполненных ячеек симметрично относительно центра.
+    :param max_attempts: integer
+        Наибольшее количество попыток получить головоломку требуемого уровня.
+    :return: GeneratedPuzzle
+    :raises RuntimeError: если за max_attempts попыток не удалось получить головоломку требуемого уровня.
+    """
+    if target is not None and target not in GRADES:
+        raise ValueError(f'Неизвестный уровень сложности: {target}')
+
+    for attempt in range(max_attempts):
+        solution = random_solution(rnd)
+        grid = dig(solution, rnd, symmetric, target)
+        puzzle_grade = grade(grid)
+        if target is None or puzzle_grade == target:
+            return GeneratedPuzzle(tuple(grid), solution, puzzle_grade)
+
+    raise RuntimeError(f'Не удалось сгенерировать головоломку уровня {target} за {max_attempts} попыток')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Генерация головоломок судоку с единственным решением.')
+    parser.add_argument('-n', '--count', type=int, default=1, help='количество головоломок')
+    parser.add_argument('-g', '--grade', choices=GRADES, default=None, help='уровень сложности')
+    parser.add_argument('-s', '--seed', type=int, default=None, help='начальное значение генератора')
+    parser.add_argument('--asymmetric', action='store_true', help='не сохранять центральную симметрию')
+    args = parser.parse_args(argv)
+
+    rnd = random.Random(args.seed)
+    for i in range(args.count):
+        puzzle = generate(args.grade, rnd, not args.asymmetric)
+        print(''.join(map(str, puzzle.grid)))
+
+
+if __name__ == '__main__':
+    main()
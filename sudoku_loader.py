@@ -0,0 +1,120 @@
+"""
+Быстрая загрузка больших файлов с головоломками в формате "одна строка из 81 символа на головоломку".
+
+Файл отображается в память и декодируется блоками средствами bytes.translate, без вызовов int() для каждого
+символа и без вложенных списков. Результат - непрерывный буфер байтов размером N x 81, каждая головоломка которого
+доступна как memoryview без копирования.
+"""
+import mmap
+import os
+
+from sudoku_parser import ParseError
+
+# Таблица перекодировки символов в значения ячеек. Недопустимые символы перекодируются в _INVALID.
+_INVALID = 0xFF
+_DECODE_TABLE = bytes(
+    ch - ord('0') if ord('0') <= ch <= ord('9') else 0 if ch == ord('.') else _INVALID for ch in range(256)
+)
+
+# Размер блока файла, декодируемого за один раз.
+_BLOCK_SIZE = 1 << 22
+
+
+class GridArray:
+    """
+    Массив головоломок в компактном виде: N x 81 байт, значения ячеек построчно, 0 - пустая ячейка.
+
+    Элементы массива - memoryview длиной 81, которые можно передать в Sudoku без копирования.
+
+    Атрибуты
+    --------
+    buffer: memoryview
+        Непрерывный буфер значений ячеек всех головоломок.
+    """
+    def __init__(self, buffer):
+        if len(buffer) % 81:
+            raise ValueError('Размер буфера должен быть кратен 81')
+        self.buffer = memoryview(buffer)
+
+    def __len__(self):
+        return len(self.buffer) // 81
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if idx not in range(len(self)):
+            raise IndexError('Индекс головоломки вне диапазона')
+        return self.buffer[idx * 81:(idx + 1) * 81]
+
+    def __iter__(self):
+        for start in range(0, len(self.buffer), 81):
+            yield self.buffer[start:start + 81]
+
+    def to_numpy(self):
+        """Возвращает массив NumPy формы (N, 81) типа uint8, разделяющий память с буфером."""
+        import numpy
+
+        return numpy.frombuffer(self.buffer, dtype=numpy.uint8).reshape(-1, 81)
+
+
+def _decode_lines(block, first_lineno):
+    """
+    Декодирует блок построчно, пропуская пустые строки и строки, начинающиеся с "#", как sudoku_parser.
+    Используется, если блок не удалось декодировать целиком.
+    :raises ParseError: с номером первой некорректной строки блока.
+    """
+    result = bytearray()
+    for lineno, line in enumerate(block.split(b'\n'), first_lineno):
+        line = line.strip()
+        if not line or line.startswith(b'#'):
+            continue
+        if len(line) != 81:
+            raise ParseError(f'ожидалось 81 символов, получено {len(line)}', lineno)
+        decoded = line.translate(_DECODE_TABLE)
+        if _INVALID in decoded:
+            ch = line[decoded.index(_INVALID):][:1].decode('ascii', errors='replace')
+            raise ParseError(f'недопустимый символ {ch!r}', lineno)
+        result += decoded
+    return result
+
+
+def load_grids(path):
+    """
+    Загружает головоломки из файла, содержащего по одной головоломке из 81 символа в строке.
+    :param path: string
+        Путь к файлу.
+    :return: GridArray
+    :raises ParseError: при некорректной строке в файле. Пустые строки и строки, начинающиеся с "#", пропускаются.
+    """
+    result = bytearray()
+    if os.path.getsize(path) == 0:
+        return GridArray(result)
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        start = 0
+        lineno = 1
+        while start < size:
+            end = mm.find(b'\n', min(start + _BLOCK_SIZE, size) - 1)
+            end = size if end == -1 else end + 1
+            block = mm[start:end]
+
+            lines = block.count(b'\n')
+            if not block.endswith(b'\n'):
+                lines += 1
+            # Каждая строка блока должна занимать ровно 81 байт и перевод строки: переводы строк стоят на каждом
+            # 82-м месте. Иначе (пустые строки, комментарии, ошибки) блок разбирается построчно.
+            text = block.replace(b'\r\n', b'\n') if b'\r' in block else block
+            if not text.endswith(b'\n'):
+                text += b'\n'
+            decoded = None
+            if len(text) == 82 * lines and text[81::82].count(b'\n') == lines:
+                decoded = text.translate(_DECODE_TABLE, b'\n')
+            if decoded is None or _INVALID in decoded:
+                decoded = _decode_lines(block, lineno)
+
+            result += decoded
+            lineno += lines
+            start = end
+
+    return GridArray(result)
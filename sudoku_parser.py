@@ -0,0 +1,92 @@
+"""
+Потоковый разбор файлов с головоломками судоку.
+
+Поддерживаются два формата, которые могут чередоваться в одном файле:
+    - формат Project Euler: строка-заголовок "Grid NN" и 9 строк по 9 цифр;
+    - одна строка из 81 символа на головоломку.
+Пустые ячейки обозначаются символами "0" или ".". Пустые строки и строки, начинающиеся с "#", пропускаются.
+"""
+import collections
+import os
+
+# Головоломка из файла: название (заголовок "Grid NN" либо None), номер первой строки записи и матрица 9x9.
+Puzzle = collections.namedtuple('Puzzle', ['name', 'lineno', 'matrix'])
+
+_CELL_VALUES = {str(digit): digit for digit in range(10)}
+_CELL_VALUES['.'] = 0
+
+
+class ParseError(ValueError):
+    """
+    Ошибка разбора файла с головоломками.
+
+    Атрибуты
+    --------
+    lineno: integer
+        Номер строки файла (начиная с 1), в которой обнаружена ошибка.
+    """
+    def __init__(self, message, lineno):
+        super().__init__(f'строка {lineno}: {message}')
+        self.lineno = lineno
+
+
+def _parse_digits(line, length, lineno):
+    """Преобразует строку из length символов в список значений ячеек."""
+    if len(line) != length:
+        raise ParseError(f'ожидалось {length} символов, получено {len(line)}', lineno)
+    try:
+        return [_CELL_VALUES[ch] for ch in line]
+    except KeyError as e:
+        raise ParseError(f'недопустимый символ {e.args[0]!r}', lineno) from None
+
+
+def _lines(f):
+    """Генератор пар (номер строки, строка без пробельных символов по краям)."""
+    for lineno, line in enumerate(f, 1):
+        if isinstance(line, bytes):
+            line = line.decode('ascii', errors='replace')
+        yield lineno, line.strip()
+
+
+def _iter_puzzles(f):
+    lines = _lines(f)
+    for lineno, line in lines:
+        if not line or line.startswith('#'):
+            continue
+
+        if line.startswith('Grid'):
+            matrix = []
+            for i in range(9):
+                row_lineno, row = next(lines, (lineno + i + 1, None))
+                if row is None:
+                    raise ParseError(f'неожиданный конец файла в записи "{line}"', row_lineno)
+                matrix.append(_parse_digits(row, 9, row_lineno))
+            yield Puzzle(line, lineno, matrix)
+        else:
+            values = _parse_digits(line, 81, lineno)
+            yield Puzzle(None, lineno, [values[i:i + 9] for i in range(0, 81, 9)])
+
+
+def iter_puzzles(source):
+    """
+    Генератор головоломок из файла. Файл читается построчно, поэтому расход памяти не зависит от его размера.
+    :param source: string, os.PathLike или файловый объект
+        Путь к файлу либо открытый (текстовый или двоичный) файловый объект.
+    :return: генератор объектов Puzzle
+    :raises ParseError: при некорректной записи в файле.
+    """
+    if isinstance(source, (str, bytes, os.PathLike)):
+        with open(source, 'r') as f:
+            yield from _iter_puzzles(f)
+    else:
+        yield from _iter_puzzles(source)
+
+
+def iter_grids(source):
+    """
+    Генератор матриц 9x9 значений ячеек головоломок из файла.
+    :param source: string, os.PathLike или файловый объект
+        Путь к файлу либо открытый файловый объект.
+    """
+    for puzzle in iter_puzzles(source):
+        yield puzzle.matrix
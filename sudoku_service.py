@@ -0,0 +1,229 @@
+"""
+Асинхронный сервис решения судоку для приложений на asyncio.
+
+Решение выполняется в пуле процессов (либо в переданном исполнителе concurrent.futures), поэтому не блокирует цикл
+событий. Запросы попадают в ограниченную очередь: когда она заполнена, отправитель ожидает освобождения места.
+Небольшие запросы объединяются в группы, число групп в работе ограничено.
+
+Пример использования:
+    async with SolverService(workers=4) as service:
+        result = await service.solve_async(grid, timeout=1.0)
+        async for result in service.solve_stream(grids):
+            ...
+"""
+import asyncio
+import collections
+import concurrent.futures
+import os
+
+from sudoku_batch import solve_grid
+
+
+def _solve_batch(grids):
+    """
+    Решает группу головоломок. Некорректная головоломка не прерывает решение остальных: вместо ее результата
+    возвращается исключение.
+    """
+    results = []
+    for grid in grids:
+        try:
+            results.append(solve_grid(grid))
+        except (TypeError, ValueError) as exc:
+            results.append(exc)
+    return results
+
+
+class SolverService:
+    """
+    Асинхронный сервис решения судоку.
+
+    Атрибуты
+    --------
+    workers: integer
+        Количество процессов пула, создаваемого сервисом.
+    max_concurrency: integer
+        Наибольшее количество групп головоломок, решаемых одновременно.
+    queue_size: integer
+        Наибольшее количество запросов, ожидающих отправки в пул.
+    batch_size: integer
+        Наибольшее количество головоломок в группе.
+    batch_delay: float
+        Время в секундах, в течение которого к первому запросу группы добавляются следующие.
+    """
+    def __init__(self, workers=None, max_concurrency=None, queue_size=1024, batch_size=16, batch_delay=0.001,
+                 executor=None):
+        """
+        :param executor: concurrent.futures.Executor
+            Исполнитель, в котором решаются головоломки. По умолчанию сервис создает пул из workers процессов и
+            закрывает его вместе с собой; переданный исполнитель сервис не закрывает.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if max_concurrency is None:
+            max_concurrency = workers
+        if min(workers, max_concurrency, queue_size, batch_size) < 1 or batch_delay < 0:
+            raise ValueError('Параметры сервиса должны быть положительными')
+
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+
+        self._executor = executor
+        self._own_executor = executor is None
+        self._queue = None
+        self._slots = None
+        self._dispatcher = None
+        self._running = set()
+        # запросы, которые диспетчер уже забрал из очереди, но еще не отправил в пул
+        self._batch = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    @property
+    def pending(self):
+        """Количество запросов, ожидающих отправки в пул."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        """Запускает сервис. Вызывается автоматически при первом запросе."""
+        if self._dispatcher is not None:
+            return
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+        self._queue = asyncio.Queue(self.queue_size)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def close(self):
+        """
+        Останавливает сервис: отменяет запросы из очереди и собираемой группы и дожидается решения уже отправленных
+        групп.
+        """
+        if self._dispatcher is None:
+            return
+        self._dispatcher.cancel()
+        try:
+            await self._dispatcher
+        except asyncio.CancelledError:
+            pass
+        self._dispatcher = None
+
+        for grid, future in self._batch:
+            future.cancel()
+        self._batch = []
+        while not self._queue.empty():
+            grid, future = self._queue.get_nowait()
+            future.cancel()
+        if self._running:
+            await asyncio.wait(self._running)
+
+        if self._own_executor:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def solve_async(self, grid, timeout=None):
+        """
+        Решает головоломку.
+        :param grid: list
+            Матрица 9x9 либо плоская последовательность из 81 значения ячеек.
+        :param timeout: float
+            Наибольшее время ожидания результата в секундах, включая ожидание в очереди. Если запрос еще не
+            отправлен в пул, он отменяется; начатое решение доводится до конца, но результат отбрасывается.
+        :return: sudoku_batch.GridResult
+        :raises asyncio.TimeoutError: при превышении времени ожидания.
+        """
+        await self.start()
+        # memoryview (элементы sudoku_loader.GridArray) не сериализуется для передачи в процесс
+        if isinstance(grid, memoryview):
+            grid = bytes(grid)
+        return await asyncio.wait_for(self._submit(grid), timeout)
+
+    async def solve_stream(self, grids, timeout=None):
+        """
+        Решает последовательность головоломок. Результаты (sudoku_batch.GridResult) выдаются в порядке
+        головоломок, при этом в работе находится ограниченное их количество.
+        :param grids: iterable
+            Головоломки - обычная либо асинхронная последовательность.
+        :param timeout: float
+            Наибольшее время ожидания результата каждой головоломки в секундах.
+        """
+        window = 2 * self.max_concurrency * self.batch_size
+        pending = collections.deque()
+        try:
+            if hasattr(grids, '__aiter__'):
+                async for grid in grids:
+                    pending.append(asyncio.ensure_future(self.solve_async(grid, timeout)))
+                    if len(pending) >= window:
+                        yield await pending.popleft()
+            else:
+                for grid in grids:
+                    pending.append(asyncio.ensure_future(self.solve_async(grid, timeout)))
+                    if len(pending) >= window:
+                        yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _submit(self, grid):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((grid, future))
+        # при отмене ожидающей задачи отменяется и future, и запрос пропускается при формировании группы
+        return await future
+
+    async def _next_batch(self):
+        """
+        Собирает группу запросов: первый запрос и те, что поступят в течение batch_delay. Запросы накапливаются в
+        self._batch, чтобы при остановке сервиса их можно было отменить.
+        """
+        loop = asyncio.get_running_loop()
+        batch = self._batch
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.batch_delay
+        while len(batch) < self.batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return [(grid, future) for grid, future in batch if not future.done()]
+
+    async def _dispatch(self):
+        while True:
+            batch = await self._next_batch()
+            if batch:
+                await self._slots.acquire()
+                task = asyncio.create_task(self._run(batch))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+            self._batch = []
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self._executor, _solve_batch, [grid for grid, future in batch])
+        except Exception as exc:
+            results = [exc] * len(batch)
+        finally:
+            self._slots.release()
+
+        for (grid, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
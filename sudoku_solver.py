@@ -1,392 +1,1480 @@
+import array
 import collections
-import copy
+import json
+import math
+import time
+
+# Поддерживаемые размеры судоку (количество цифр): квадраты 2x2, 3x3, 4x4 и 5x5.
+SIZES = (4, 9, 16, 25)
+
+# Размер судоку по длине плоской последовательности значений.
+_FLAT_SIZES = {size * size: size for size in SIZES}
+
+# Размер судоку по длине записи из символов (см. Sudoku.from_bytes()): по символу на ячейку записываются только
+# однозначные значения.
+_STRING_SIZES = {16: 4, 81: 9}
+
+# Таблица перекодировки символов записи в значения ячеек. Недопустимые символы перекодируются в 0xFF, поэтому
+# проверка записи сводится к сравнению наибольшего значения с размером судоку.
+_DECODE_TABLE = bytes(
+    ch - ord('0') if ord('0') <= ch <= ord('9') else 0 if ch == ord('.') else 0xFF for ch in range(256)
+)
+
+# Таблицы перекодировки без проверки записи (по размеру судоку): недопустимые символы и цифры больше размера
+# перекодируются в 0 - пустую ячейку.
+_TRUSTED_DECODE_TABLES = {size: bytes(value if value <= size else 0 for value in _DECODE_TABLE)
+                          for size in _STRING_SIZES.values()}
+
+
+# Размер части таблицы, копируемой за один раз при построении таблиц _bit_tables.
+_TABLE_CHUNK = 1 << 20
+
+
+def _bit_tables(size):
+    """
+    Строит таблицы количества установленных битов и индекса младшего установленного бита для всех масок из size
+    битов. Для size <= 9 таблицы - кортежи (индекс младшего бита нулевой маски равен -1); для больших размеров -
+    массивы bytearray по байту на маску, которые заполняются на месте удвоением, без временных копий таблиц.
+    """
+    if size <= 9:
+        popcount = tuple(bin(mask).count('1') for mask in range(1 << size))
+        lowest_bit = (-1,) + tuple((mask & -mask).bit_length() - 1 for mask in range(1, 1 << size))
+        return popcount, lowest_bit
+
+    # маски [2^i, 2^(i+1)) отличаются от масок [0, 2^i) установленным битом i
+    increment = bytes(range(1, 256)) + b'\0'
+    popcount = bytearray(1 << size)
+    lowest_bit = bytearray(1 << size)
+    lowest_bit[0] = 0xFF
+    lowest_view = memoryview(lowest_bit)
+    for i in range(size):
+        count = 1 << i
+        # половина таблицы копируется частями, чтобы не создавать ее временную копию целиком
+        for start in range(0, count, _TABLE_CHUNK):
+            end = min(start + _TABLE_CHUNK, count)
+            popcount[count + start:count + end] = popcount[start:end].translate(increment)
+            lowest_bit[count + start:count + end] = lowest_view[start:end]
+        lowest_bit[count] = i
+    lowest_view.release()
+    return popcount, lowest_bit
+
+
+class Topology:
+    """
+    Топология судоку заданного размера, общая для всех головоломок этого размера. Ячейки адресуются позицией в
+    плоских списках: pos = size * row + col. Кандидаты ячейки хранятся в виде битовой маски: бит (d - 1)
+    установлен, если цифра d возможна в ячейке.
+
+    Атрибуты
+    --------
+    size: integer
+        Количество цифр, а также ячеек в строке, столбце и квадрате.
+    box: integer
+        Сторона квадрата.
+    cells: integer
+        Количество ячеек.
+    typecode: string
+        Код типа array.array, вмещающего маску кандидатов.
+    full_mask: integer
+        Маска всех цифр.
+    digit_bits: tuple
+        Маска одной цифры: digit_bits[d] == 1 << (d - 1), digit_bits[0] == 0.
+    popcount: tuple | bytearray
+        Количество установленных битов маски.
+    lowest_bit: tuple | bytearray
+        Индекс младшего установленного бита ненулевой маски.
+    rows, columns, squares: tuple
+        Позиции ячеек строк, столбцов и квадратов.
+    houses: tuple
+        Все блоки в порядке Sudoku.houses(): строки, столбцы, квадраты.
+    row_of, column_of, square_of: tuple
+        Индексы строки, столбца и квадрата ячейки.
+    cell_houses: tuple
+        Индексы блоков (в houses), которым принадлежит ячейка: строка, столбец, квадрат.
+    cell_house_bits: tuple
+        Бит ячейки в масках позиций ее строки, столбца и квадрата: 1 << (индекс ячейки в блоке).
+    peers: tuple
+        Соседи ячейки - остальные ячейки ее строки, столбца и квадрата.
+    segments: tuple
+        Отрезки - пересечения строк и столбцов с квадратами, по box ячеек: отрезок box * h + j - j-я тройка
+        (для 9x9) ячеек линии houses[h], сначала отрезки строк, затем столбцов.
+    segment_houses: tuple
+        Индексы блоков отрезка: линия и квадрат.
+    segment_rests: tuple
+        Остальные ячейки линии и остальные ячейки квадрата отрезка.
+    house_segments: tuple
+        Группы отрезков, на которые разбит блок: у линии одна группа, у квадрата две - отрезки строк и столбцов.
+    cell_boards: tuple
+        Битовая доска ячейки - целое число, в котором бит size * h + i соответствует i-й ячейке блока houses[h],
+        то есть каждая ячейка представлена тремя битами: в своих строке, столбце и квадрате.
+    peer_boards: tuple
+        Битовая доска ячейки и ее соседей.
+    all_boards: integer
+        Битовая доска всех ячеек.
+    low_boards: integer
+        Битовая доска первых ячеек всех блоков.
+    """
+    __slots__ = ('size', 'box', 'cells', 'typecode', 'full_mask', 'digit_bits', 'popcount', 'lowest_bit',
+                 'mask_digits', 'rows', 'columns', 'squares', 'houses', 'row_of', 'column_of', 'square_of',
+                 'cell_houses', 'cell_house_bits', 'peers', 'segments', 'segment_houses', 'segment_rests',
+                 'house_segments', 'cell_boards', 'peer_boards', 'all_boards', 'low_boards')
+
+    def __init__(self, size):
+        """
+        :param size: integer
+            Количество цифр (один из SIZES).
+        """
+        if size not in SIZES:
+            raise ValueError(f'Размер судоку должен быть одним из {SIZES}')
+
+        box = self.box = math.isqrt(size)
+        self.size = size
+        self.cells = cells = size * size
+        self.typecode = 'H' if size <= 16 else 'L'
+        self.full_mask = (1 << size) - 1
+        self.digit_bits = (0,) + tuple(1 << i for i in range(size))
+        self.popcount, self.lowest_bit = _bit_tables(size)
+        # таблица множеств цифр для больших размеров заняла бы слишком много памяти
+        self.mask_digits = None
+        if size <= 9:
+            self.mask_digits = tuple(frozenset(i + 1 for i in range(size) if mask & (1 << i))
+                                     for mask in range(1 << size))
+
+        self.rows = tuple(tuple(size * idx_row + idx_col for idx_col in range(size)) for idx_row in range(size))
+        self.columns = tuple(tuple(size * idx_row + idx_col for idx_row in range(size)) for idx_col in range(size))
+        self.squares = tuple(tuple(size * (box * (idx // box) + i // box) + box * (idx % box) + i % box
+                                   for i in range(size)) for idx in range(size))
+        self.houses = houses = self.rows + self.columns + self.squares
+
+        self.row_of = tuple(pos // size for pos in range(cells))
+        self.column_of = tuple(pos % size for pos in range(cells))
+        self.square_of = tuple((pos // (box * size)) * box + (pos % size) // box for pos in range(cells))
+
+        self.cell_houses = tuple((self.row_of[pos], size + self.column_of[pos], 2 * size + self.square_of[pos])
+                                 for pos in range(cells))
+        self.cell_house_bits = tuple(tuple(1 << houses[house].index(pos) for house in self.cell_houses[pos])
+                                     for pos in range(cells))
+        self.peers = tuple(tuple(sorted({peer for house in self.cell_houses[pos] for peer in houses[house]} - {pos}))
+                           for pos in range(cells))
+
+        lines = self.rows + self.columns
+        self.segments = tuple(line[box * j:box * (j + 1)] for line in lines for j in range(box))
+        self.segment_houses = tuple((k // box, 2 * size + self.square_of[segment[0]])
+                                    for k, segment in enumerate(self.segments))
+        self.segment_rests = tuple(tuple(tuple(pos for pos in houses[house] if pos not in segment)
+                                         for house in self.segment_houses[k])
+                                   for k, segment in enumerate(self.segments))
+        self.house_segments = tuple((tuple(range(box * h, box * (h + 1))),) for h in range(2 * size)) + tuple(
+            (tuple(box * (box * (idx // box) + i) + idx % box for i in range(box)),
+             tuple(box * (size + box * (idx % box) + i) + idx // box for i in range(box)))
+            for idx in range(size))
+
+        boards = [0] * cells
+        for idx, house in enumerate(houses):
+            for i, pos in enumerate(house):
+                boards[pos] |= 1 << (size * idx + i)
+        self.cell_boards = tuple(boards)
+        self.peer_boards = tuple(boards[pos] | sum(boards[peer] for peer in self.peers[pos]) for pos in range(cells))
+        self.all_boards = (1 << 3 * cells) - 1
+        self.low_boards = self.all_boards // self.full_mask
+
+    def digits(self, mask):
+        """Возвращает множество цифр (frozenset), соответствующее маске."""
+        if self.mask_digits is not None:
+            return self.mask_digits[mask]
+        return frozenset(i + 1 for i in range(self.size) if mask >> i & 1)
+
+
+_TOPOLOGIES = {}
+
+
+def topology(size=9):
+    """
+    Возвращает топологию судоку заданного размера. Таблицы строятся при первом обращении и далее разделяются всеми
+    головоломками этого размера.
+    :param size: integer
+        Количество цифр (один из SIZES).
+    :return: Topology
+    """
+    result = _TOPOLOGIES.get(size)
+    if result is None:
+        result = _TOPOLOGIES[size] = Topology(size)
+    return result
+
+
+# Таблицы классического судоку 9x9 (см. атрибуты Topology).
+_CLASSIC = topology(9)
+FULL_MASK = _CLASSIC.full_mask
+DIGIT_BITS = _CLASSIC.digit_bits
+POPCOUNT = _CLASSIC.popcount
+LOWEST_BIT = _CLASSIC.lowest_bit
+MASK_DIGITS = _CLASSIC.mask_digits
+ROWS = _CLASSIC.rows
+COLUMNS = _CLASSIC.columns
+SQUARES = _CLASSIC.squares
+HOUSES = _CLASSIC.houses
+ROW_OF = _CLASSIC.row_of
+COLUMN_OF = _CLASSIC.column_of
+SQUARE_OF = _CLASSIC.square_of
+CELL_HOUSES = _CLASSIC.cell_houses
+CELL_HOUSE_BITS = _CLASSIC.cell_house_bits
+PEERS = _CLASSIC.peers
+
+# Снимок состояния головоломки: значения ячеек (bytes), маски кандидатов (array.array), маски позиций цифр в блоках
+# (array.array), маски установленных в блоках цифр (array.array) и количество неразгаданных ячеек.
+Snapshot = collections.namedtuple('Snapshot', ['values', 'masks', 'positions', 'placed', 'unsolved_cells'])
+
+# Состояния, которыми завершается Sudoku.solve().
+SOLVED = 'solved'              # головоломка решена
+UNSOLVED = 'unsolved'          # логических методов недостаточно, поиск не выполнялся
+NO_SOLUTION = 'no_solution'    # поиск показал, что решения не существует
+TIMEOUT = 'timeout'            # истекло отведенное время
+ROUND_LIMIT = 'round_limit'    # исчерпан лимит проходов логических методов
+NODE_LIMIT = 'node_limit'      # исчерпан лимит узлов поиска
+
+# Результат Sudoku.solve(): состояние, количество заполненных ячеек, методы решения, давшие результат (в порядке
+# первого применения), время решения в секундах, а при записи шагов - список шагов Step и оценка сложности
+# (иначе None).
+SolveResult = collections.namedtuple('SolveResult', ['status', 'filled', 'techniques', 'elapsed', 'trace', 'score'])
+
+# Шаг решения: метод решения (либо search для предположения при поиске), маска измененных блоков (бит h - блок
+# Sudoku.topology.houses[h]), количество исключенных кандидатов и установленных значений.
+Step = collections.namedtuple('Step', ['technique', 'houses', 'eliminations', 'placements'])
+
+# Вес шага решения в оценке сложности. Оценка - сумма весов всех шагов, поэтому учитывается и то, какие методы
+# потребовались, и то, сколько раз. Шаги методов, отсутствующих в таблице, в оценке не учитываются.
+TECHNIQUE_WEIGHTS = {
+    'solve_naked_singles': 1,
+    'solve_hidden_singles': 2,
+    'solve_naked_pairs': 5,
+    'solve_hidden_pairs': 8,
+    'solve_intersection_removal': 10,
+    'solve_x_wing': 20,
+    'solve_naked_triples': 25,
+    'solve_hidden_triples': 30,
+    'solve_swordfish': 40,
+    'solve_naked_quads': 45,
+    'solve_hidden_quads': 50,
+    'solve_jellyfish': 60,
+    'search': 100,
+}
+
+
+def _check_value(value, size=9):
+    """Проверяет, что значение может быть записано в ячейку судоку размера size."""
+    if not isinstance(value, int):
+        raise TypeError('Значением ячейки может быть только целое число')
+    elif value not in range(size + 1):
+        raise ValueError(f'Значение ячейки должно находится в интервале 0-{size}')
+
+
+def _find_subsets(masks, size, popcount=POPCOUNT):
+    """
+    Перебирает сочетания из size масок, объединение которых содержит не более size битов. Ветви перебора, в которых
+    объединение уже содержит больше size битов, отсекаются.
+    :param masks: list
+        Маски элементов (ячеек, цифр или линий).
+    :param size: integer
+        Размер сочетания.
+    :param popcount: tuple | bytes
+        Таблица количества установленных битов (Topology.popcount) для масок такой ширины.
+    :return: list
+        Пары (маска номеров элементов сочетания в masks, объединение их масок).
+    """
+    found = []
+    count = len(masks)
+    # стек: (номер следующего элемента, выбранные элементы, объединение масок, количество выбранных)
+    stack = [(0, 0, 0, 0)]
+    while stack:
+        start, members, union, chosen = stack.pop()
+        for i in range(start, count - (size - chosen) + 1):
+            extended = union | masks[i]
+            if popcount[extended] > size:
+                continue
+            if chosen + 1 == size:
+                found.append((members | 1 << i, extended))
+            else:
+                stack.append((i + 1, members | 1 << i, extended, chosen + 1))
+    return found
+
+
+class Contradiction(ValueError):
+    """
+    Противоречие в головоломке: цифра повторяется в блоке, у неразгаданной ячейки не осталось кандидатов либо
+    цифре не осталось места в блоке. Возбуждается при создании головоломки с повторяющимися значениями и при
+    исключении кандидата, которое приводит к противоречию.
+
+    Атрибуты
+    --------
+    pos: integer
+        Позиция ячейки, на которой обнаружено противоречие, либо None.
+    digit: integer
+        Цифра, которая повторяется либо которой не осталось места, иначе None.
+    house: integer
+        Индекс блока (в Topology.houses), в котором цифра повторяется либо ей не осталось места, иначе None.
+    """
+    def __init__(self, message, pos=None, digit=None, house=None):
+        super().__init__(message)
+        self.pos = pos
+        self.digit = digit
+        self.house = house
+
+
+class _BudgetExceeded(Exception):
+    """Прерывает решение при исчерпании бюджета. Атрибут status - исчерпанный бюджет."""
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+class _Budget:
+    """Ограничения на время решения, количество проходов логических методов и количество узлов поиска."""
+    __slots__ = ('deadline', 'max_rounds', 'max_nodes', 'rounds', 'nodes')
+
+    def __init__(self, timeout, max_rounds, max_nodes):
+        self.deadline = None if timeout is None else time.perf_counter() + timeout
+        self.max_rounds = max_rounds
+        self.max_nodes = max_nodes
+        self.rounds = 0
+        self.nodes = 0
+
+    def _check_time(self):
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise _BudgetExceeded(TIMEOUT)
+
+    def round(self):
+        self.rounds += 1
+        if self.max_rounds is not None and self.rounds > self.max_rounds:
+            raise _BudgetExceeded(ROUND_LIMIT)
+        self._check_time()
+
+    def node(self):
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise _BudgetExceeded(NODE_LIMIT)
+        self._check_time()
+
+
+class TechniqueStats:
+    """
+    Статистика применения одного метода решения.
+
+    Атрибуты
+    --------
+    calls: integer
+        Количество вызовов.
+    seconds: float
+        Суммарное время работы в секундах.
+    eliminations: integer
+        Количество исключенных кандидатов.
+    placements: integer
+        Количество установленных значений.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.eliminations = 0
+        self.placements = 0
+
+    def as_dict(self):
+        return {'calls': self.calls, 'seconds': self.seconds, 'eliminations': self.eliminations,
+                'placements': self.placements}
+
+
+class SolveStats:
+    """
+    Сборщик статистики решения. Подключается к судоку атрибутом Sudoku.stats; может быть общим для многих
+    головоломок. Учитываются вызовы методов решения планировщиком TechniqueScheduler.
+
+    Атрибуты
+    --------
+    grids: integer
+        Количество решенных головоломок (вызовов Sudoku.solve()).
+    techniques: dict
+        Статистика по методам решения: название метода -> TechniqueStats.
+    escalations: integer
+        Количество переходов планировщика к более дорогому методу решения.
+    search_nodes: integer
+        Количество узлов поиска с возвратом.
+    """
+    def __init__(self):
+        self.grids = 0
+        self.techniques = {}
+        self.escalations = 0
+        self.search_nodes = 0
+
+    def record(self, technique, seconds, eliminations, placements):
+        """Добавляет результаты одного вызова метода решения."""
+        stats = self.techniques.get(technique)
+        if stats is None:
+            stats = self.techniques[technique] = TechniqueStats()
+        stats.calls += 1
+        stats.seconds += seconds
+        stats.eliminations += eliminations
+        stats.placements += placements
+
+    def merge(self, other):
+        """Добавляет статистику другого сборщика, например, собранную в другом процессе."""
+        self.grids += other.grids
+        self.escalations += other.escalations
+        self.search_nodes += other.search_nodes
+        for technique, stats in other.techniques.items():
+            own = self.techniques.get(technique)
+            if own is None:
+                own = self.techniques[technique] = TechniqueStats()
+            own.calls += stats.calls
+            own.seconds += stats.seconds
+            own.eliminations += stats.eliminations
+            own.placements += stats.placements
+
+    def as_dict(self):
+        return {
+            'grids': self.grids,
+            'escalations': self.escalations,
+            'search_nodes': self.search_nodes,
+            'techniques': {technique: stats.as_dict() for technique, stats in self.techniques.items()},
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.as_dict(), **kwargs)
+
+
+class TechniqueScheduler:
+    """
+    Планировщик логических методов решения. Методы упорядочены по возрастанию стоимости: планировщик применяет
+    самый дешевый метод, к более дорогому переходит только если предыдущий не дал результата, а после любого
+    результата возвращается к самому дешевому. Применение заканчивается, когда не дал результата последний метод
+    либо головоломка решена.
+
+    Метод решения - функция, принимающая Sudoku, например Sudoku.solve_x_wing. Название функции используется в
+    статистике и в результатах Sudoku.solve().
+
+    Атрибуты
+    --------
+    techniques: list
+        Методы решения в порядке возрастания стоимости.
+    search_techniques: list
+        Методы, применяемые в узлах поиска с возвратом, в том же порядке. В узлах поиска дорогие методы редко
+        сокращают перебор настолько, чтобы окупить время их применения.
+    """
+    def __init__(self, techniques, search_techniques=None):
+        """
+        :param techniques: iterable
+            Методы решения в порядке возрастания стоимости.
+        :param search_techniques: iterable
+            Методы для узлов поиска. По умолчанию - все методы.
+        """
+        self.techniques = list(techniques)
+        self.search_techniques = list(self.techniques if search_techniques is None else search_techniques)
+
+    @classmethod
+    def default(cls):
+        """
+        Создает планировщик со всеми методами Sudoku: одиночки, пары, указывающие пары, X-Wing, тройки, Swordfish,
+        четверки и Jellyfish. В узлах поиска применяются методы до X-Wing включительно.
+        :return: TechniqueScheduler
+        """
+        techniques = [Sudoku.solve_naked_singles, Sudoku.solve_hidden_singles, Sudoku.solve_naked_pairs,
+                      Sudoku.solve_hidden_pairs, Sudoku.solve_intersection_removal, Sudoku.solve_x_wing,
+                      Sudoku.solve_naked_triples, Sudoku.solve_hidden_triples, Sudoku.solve_swordfish,
+                      Sudoku.solve_naked_quads, Sudoku.solve_hidden_quads, Sudoku.solve_jellyfish]
+        return cls(techniques, techniques[:6])
+
+    def register(self, technique, index=None, search=True):
+        """
+        Добавляет метод решения.
+        :param technique: function
+            Метод решения - функция, принимающая Sudoku.
+        :param index: integer
+            Позиция метода в порядке стоимости. По умолчанию метод добавляется последним.
+        :param search: bool
+            Применять метод и в узлах поиска.
+        """
+        if index is None:
+            index = len(self.techniques)
+        if search:
+            cheaper = self.techniques[:index]
+            self.search_techniques.insert(sum(1 for other in self.search_techniques if other in cheaper), technique)
+        self.techniques.insert(index, technique)
+
+    def run(self, sudoku, search=False):
+        """
+        Применяет методы решения к головоломке, пока они дают результат.
+        :param sudoku: Sudoku
+        :param search: bool
+            Применять только методы для узлов поиска.
+        """
+        techniques = self.search_techniques if search else self.techniques
+        count = len(techniques)
+        budget = sudoku._budget
+        stats = sudoku.stats
+
+        # проход - применение методов от самого дешевого до первого, давшего результат
+        if budget is not None:
+            budget.round()
+        idx = 0
+        while idx < count and sudoku.unsolved_cells:
+            if sudoku._apply(techniques[idx]):
+                if idx and budget is not None:
+                    budget.round()
+                idx = 0
+            else:
+                idx += 1
+                if stats is not None and idx < count:
+                    stats.escalations += 1
+
+
+def count_solutions(grid, limit=2):
+    """
+    Считает решения головоломки, останавливаясь на limit найденных.
+    :param grid: list
+        Матрица NxN либо плоская последовательность из N * N значений ячеек.
+    :param limit: integer
+        Наибольшее количество искомых решений.
+    :return: integer
+        Количество решений, но не более limit: 0 - решений нет, 1 - решение единственно.
+    """
+    try:
+        sudoku = Sudoku(grid)
+    except Contradiction:
+        return 0
+    return sudoku.count_solutions(limit)
+
 
 class Sudoku:
     """
-    Класс головоломки судоку.
+    Класс головоломки судоку. Помимо классического судоку 9x9 поддерживаются размеры 4x4, 16x16 и 25x25 (см.
+    SIZES): размер определяется по входным данным, таблицы топологии берутся из topology().
+
+    Состояние головоломки хранится в компактных плоских массивах, поэтому объект 9x9 занимает около двух килобайт.
+    Объекты Cell создаются только при первом обращении к атрибуту cells.
 
     Атрибуты
     --------
+    topology: Topology
+        Топология судоку.
+    size: integer
+        Количество цифр, а также ячеек в строке, столбце и квадрате (только для чтения).
     cells: list
-        Матрица, состоящая из объектов Cell. Представлена в виде списка из 9 вложенных списков, содержащих
-        по 9 объектов Cell.
+        Матрица, состоящая из объектов Cell. Представлена в виде списка из size вложенных списков, содержащих
+        по size объектов Cell.
+    values: bytearray
+        Плоский массив из size * size значений ячеек (построчно). 0 - значение еще не разгадано.
+    masks: array.array
+        Плоский массив битовых масок кандидатов ячеек (построчно). Для разгаданной ячейки маска равна 0.
+    eliminations: integer
+        Общее количество исключенных кандидатов.
+    stats: SolveStats
+        Сборщик статистики решения либо None, если статистика не собирается.
     """
-    def __init__(self, content_matrix):
+    __slots__ = ('topology', 'values', 'masks', 'unsolved_cells', 'eliminations', 'stats', '_cells', '_stamp',
+                 '_seen_stamps', '_house_stamps', '_singles', '_positions', '_placed', '_segment_masks',
+                 '_contradiction', '_budget',
+                 '_scheduler', '_used', '_trace')
 
-        self.cells = []
-        self.unsolved_cells = 0
+    def __init__(self, content_matrix, stats=None):
+        """
+        :param content_matrix: list
+            Матрица NxN значений ячеек либо плоская последовательность из N * N значений (построчно), например
+            memoryview из sudoku_loader.GridArray. 0 - пустая ячейка. N - один из SIZES.
+        :param stats: SolveStats
+            Сборщик статистики решения.
+        :raises Contradiction: если значение повторяется в блоке.
+        """
+
+        # 16 значений могут быть и плоским судоку 4x4, и матрицей 16x16: плоская последовательность состоит из чисел
+        length = len(content_matrix)
+        if length in _FLAT_SIZES and (length not in SIZES or isinstance(content_matrix[0], int)):
+            content_values = content_matrix
+            size = _FLAT_SIZES[length]
+        else:
+            content_values = [value for row in content_matrix for value in row]
+            size = length
+        t = topology(size)
+        if len(content_values) != t.cells:
+            raise ValueError(f'Судоку {size}x{size} должно содержать {t.cells} значений')
+
+        # bytearray сам проверяет, что значения - целые числа от 0 до 255; поэлементная проверка нужна только для
+        # сообщения об ошибке
+        try:
+            values = bytearray(content_values)
+        except (TypeError, ValueError):
+            values = None
+        if values is None or max(values) > size:
+            for value in content_values:
+                _check_value(value, size)
+
+        self._setup(t, values, stats)
+
+    @classmethod
+    def from_bytes(cls, data, stats=None, validate=True):
+        """
+        Создает судоку из записи по символу на ячейку (построчно): цифры 1 - 9, "0" или "." - пустая ячейка. Запись
+        декодируется и проверяется одним вызовом bytes.translate по таблице, без поэлементных проверок.
+        :param data: bytes
+            Запись из 81 (либо 16 для судоку 4x4) символа, например b'003020600900305001...'.
+        :param stats: SolveStats
+            Сборщик статистики решения.
+        :param validate: bool
+            Проверять символы записи. Для доверенных данных проверку можно отключить; недопустимый символ в этом
+            случае читается как пустая ячейка.
+        :return: Sudoku
+        :raises Contradiction: если значение повторяется в блоке.
+        """
+        size = _STRING_SIZES.get(len(data))
+        if size is None:
+            raise ValueError(f'Запись судоку должна содержать {" либо ".join(map(str, _STRING_SIZES))} символов')
+        if validate:
+            values = bytearray(data).translate(_DECODE_TABLE)
+            if max(values) > size:
+                raise ValueError(f'Запись судоку содержит недопустимый символ: {bytes(data)!r}')
+        else:
+            values = bytearray(data).translate(_TRUSTED_DECODE_TABLES[size])
 
-        for i in range(9):
-            self.cells.append([])
-            for j in range(9):
-                self.cells[-1].append(Cell(content_matrix[i][j], i, j))
+        sudoku = cls.__new__(cls)
+        sudoku._setup(topology(size), values, stats)
+        return sudoku
 
-        full_set = set(range(1, 10))
-        rows_choices = [full_set - {cell.value for cell in row if cell.value != 0} for row in self.cells]
-        column_choices = [full_set - {cell.value for cell in self.column(idx) if cell.value != 0} for idx in range(9)]
-        square_choices = [full_set - {cell.value for cell in self.square(idx) if cell.value != 0} for idx in range(9)]
+    @classmethod
+    def from_string(cls, text, stats=None, validate=True):
+        """
+        Создает судоку из строки по символу на ячейку (см. from_bytes()), например '4.....8.5.3..........7......'.
+        :param text: string
+        :param stats: SolveStats
+            Сборщик статистики решения.
+        :param validate: bool
+            Проверять символы строки.
+        :return: Sudoku
+        :raises Contradiction: если значение повторяется в блоке.
+        """
+        return cls.from_bytes(text.encode('ascii', errors='replace'), stats, validate)
 
-        for row in self.cells:
-            for cell in row:
-                if cell.value == 0:
-                    self.unsolved_cells += 1
-                    cell.choices = rows_choices[cell.idx_row] & \
-                                   column_choices[cell.idx_col] & \
-                                   square_choices[cell.idx_square]
+    def _setup(self, t, values, stats):
+        """
+        Инициализирует состояние по проверенным значениям ячеек: вычисляет маски кандидатов и маски позиций цифр в
+        блоках. Повторяющиеся значения отвергаются сразу; остальные противоречия запоминаются и обнаруживаются
+        при решении.
+        :param t: Topology
+        :param values: bytearray
+            Значения ячеек, принадлежащие новому объекту.
+        :param stats: SolveStats
+        """
+        size = t.size
+        full_mask = t.full_mask
+        digit_bits = t.digit_bits
+        cell_houses = t.cell_houses
+        cell_boards = t.cell_boards
+        peer_boards = t.peer_boards
+
+        self.topology = t
+        self.values = values
+        self.eliminations = 0
+        self.stats = stats
+        self._cells = None
+        self._budget = None
+        self._scheduler = None
+        self._used = {}
+        self._trace = None
+
+        # Цифры каждого блока, а также битовые доски (см. Topology.cell_boards) заполненных ячеек, ячеек с каждой
+        # цифрой и ячеек, в которых цифра невозможна из-за заполненного соседа.
+        used = [0] * (3 * size)
+        filled = 0
+        holding = [0] * (size + 1)
+        blocked = [0] * (size + 1)
+        for pos, value in enumerate(values):
+            if value:
+                bit = digit_bits[value]
+                idx_row, idx_col, idx_square = cell_houses[pos]
+                if (used[idx_row] | used[idx_col] | used[idx_square]) & bit:
+                    house = next(idx for idx in cell_houses[pos] if used[idx] & bit)
+                    raise Contradiction(f'Цифра {value} повторяется в блоке {house}', pos, value, house)
+                used[idx_row] |= bit
+                used[idx_col] |= bit
+                used[idx_square] |= bit
+                filled |= cell_boards[pos]
+                holding[value] |= cell_boards[pos]
+                blocked[value] |= peer_boards[pos]
+
+        self.masks = array.array(t.typecode, [0 if value else full_mask & ~(used[idx_row] | used[idx_col] |
+                                                                            used[idx_square])
+                                              for value, (idx_row, idx_col, idx_square) in zip(values, cell_houses)])
+        self.unsolved_cells = t.cells - bin(filled).count('1') // 3
+
+        # Маски позиций цифр в блоках: элемент size * h + d - 1 содержит бит i, если цифра d возможна в i-й ячейке
+        # блока houses[h]. Поддерживаются при исключении кандидатов и установке значений. Маски всех блоков для
+        # цифры d - подряд идущие группы по size битов доски свободных от нее ячеек.
+        free = t.all_boards & ~filled
+        boards = [free & ~blocked[digit] for digit in range(1, size + 1)]
+        self._positions = array.array(t.typecode, [board >> shift & full_mask for shift in range(0, 3 * t.cells, size)
+                                                   for board in boards])
+        self._placed = array.array(t.typecode, used)
+        self._contradiction = self._find_contradiction(free, boards, holding)
+
+        # Состояние инкрементального распространения ограничений: метка времени последнего изменения каждого
+        # блока, метки последнего прохода методов решения и очередь ячеек с единственным кандидатом.
+        self._stamp = 0
+        self._seen_stamps = {}
+        self._mark_all_dirty()
+        # маски кандидатов отрезков (Topology.segments), пересчитываются solve_intersection_removal
+        self._segment_masks = [0] * len(t.segments)
+
+    def _find_contradiction(self, free, boards, holding):
+        """
+        Ищет противоречия в начальном состоянии по битовым доскам: ячейку без кандидатов и блок, в котором цифре не
+        осталось места.
+        :param free: integer
+            Доска пустых ячеек.
+        :param boards: list
+            Доски ячеек, в которых возможна каждая цифра.
+        :param holding: list
+            Доски ячеек, содержащих каждую цифру (элемент 0 не используется).
+        :return: Contradiction либо None
+        """
+        t = self.topology
+        size = t.size
+        union = 0
+        for board in boards:
+            union |= board
+        # в первых size * size битах доски ячейки пронумерованы построчно, то есть номер бита равен позиции ячейки
+        empty = free & ~union & ((1 << t.cells) - 1)
+        if empty:
+            pos = (empty & -empty).bit_length() - 1
+            return Contradiction(f'У ячейки {pos} не осталось кандидатов', pos)
+
+        # Блок без места для цифры - нулевая группа из size битов доски. Наличие нулевой группы проверяется без
+        # перебора групп приемом поиска нулевого байта: (x - low) & ~x & high != 0 тогда и только тогда, когда в x
+        # есть нулевая группа.
+        low = t.low_boards
+        high = low << (size - 1)
+        for digit, board in enumerate(boards, 1):
+            board |= holding[digit]
+            if (board - low) & ~board & high:
+                house = next(idx for idx in range(3 * size) if not board >> (size * idx) & t.full_mask)
+                return Contradiction(f'Цифре {digit} не осталось места в блоке {house}', digit=digit, house=house)
+        return None
+
+    @property
+    def size(self):
+        return self.topology.size
+
+    @property
+    def cells(self):
+        if self._cells is None:
+            size = self.topology.size
+            self._cells = [[Cell.view(self, i, j) for j in range(size)] for i in range(size)]
+        return self._cells
 
     def __repr__(self):
-        result = '---+' * 8 + '---\n'
-        for i in range(3):
-            for idx_row in range(3 * i, 3 * i + 3):
-                row = [str(cell.value) if cell.value != 0 else 'X' for cell in self.cells[idx_row]]
-                result += ' {}   {}   {} | {}   {}   {} | {}   {}   {} \n'.format(*row)
-                if idx_row != 3 * i + 2:
-                    result += '{}+{}+{}\n'.format(' ' * 11, ' ' * 11, ' ' * 11)
-            result += '---+' * 8 + '---\n'
+        t = self.topology
+        width = len(str(t.size))
+        border = '+'.join(['-' * (width + 2)] * t.size) + '\n'
+        inner = '+'.join([' ' * (t.box * (width + 3) - 1)] * t.box) + '\n'
+
+        result = border
+        for idx_row, row in enumerate(t.rows):
+            values = [str(self.values[pos]).rjust(width) if self.values[pos] != 0 else 'X'.rjust(width)
+                      for pos in row]
+            result += '|'.join(' ' + '   '.join(values[i:i + t.box]) + ' ' for i in range(0, t.size, t.box)) + '\n'
+            result += border if idx_row % t.box == t.box - 1 else inner
 
         return result
 
     def column(self, idx):
         """Возвращает ячейки столбца.
         :param idx: integer
-            Индекс столбца (0 - 8).
+            Индекс столбца (0 - size - 1).
         """
-        if idx not in range(9):
+        t = self.topology
+        if idx not in range(t.size):
             raise ValueError
 
-        return [row[idx] for row in self.cells]
+        return [self.cells[t.row_of[pos]][t.column_of[pos]] for pos in t.columns[idx]]
 
     def square(self, idx):
         """
         Возвращает ячейки квадрата.
         :param idx: integer
-            Индекс квадрата (0 - 8).
+            Индекс квадрата (0 - size - 1).
         """
-        if idx not in range(9):
+        t = self.topology
+        if idx not in range(t.size):
             raise ValueError
 
-        if idx < 3:
-            start_row = 0
-        elif idx < 6:
-            start_row = 3
-        else:
-            start_row = 6
-
-        start_col = 3 * (idx % 3)
-
-        result = []
-        for row in self.cells[start_row:start_row + 3]:
-            for cell in row[start_col:start_col + 3]:
-                result.append(cell)
-
-        return result
+        return [self.cells[t.row_of[pos]][t.column_of[pos]] for pos in t.squares[idx]]
 
     def houses(self):
         """
         Генератор для обхода всех блоков судоку - сначала всех строк, потом всех столбцов, потом все квадратов.
         """
-        for row in self.cells:
-            yield row
+        t = self.topology
+        for house in t.houses:
+            yield [self.cells[t.row_of[pos]][t.column_of[pos]] for pos in house]
+
+    def _remove_positions(self, pos, digits):
+        """
+        Отмечает в масках позиций блоков ячейки, что цифры из маски digits в ячейке невозможны.
+        :raises Contradiction: если цифре, еще не установленной в блоке ячейки, не осталось в нем места.
+        """
+        t = self.topology
+        size = t.size
+        lowest_bit = t.lowest_bit
+        positions = self._positions
+        idx_row, idx_col, idx_square = t.cell_houses[pos]
+        bit_row, bit_col, bit_square = t.cell_house_bits[pos]
+        row, col, square = size * idx_row, size * idx_col, size * idx_square
+        while digits:
+            digit = lowest_bit[digits]
+            digits &= digits - 1
+            where_row = positions[row + digit] = positions[row + digit] & ~bit_row
+            where_col = positions[col + digit] = positions[col + digit] & ~bit_col
+            where_square = positions[square + digit] = positions[square + digit] & ~bit_square
+            if not (where_row and where_col and where_square):
+                self._check_places(pos, digit)
+
+    def _check_places(self, pos, digit):
+        """
+        Проверяет, что в каждом блоке ячейки цифра либо установлена, либо еще возможна.
+        :param pos: integer
+            Позиция ячейки.
+        :param digit: integer
+            Индекс цифры (цифра - 1).
+        :raises Contradiction: если цифре не осталось места в блоке.
+        """
+        size = self.topology.size
+        for house in self.topology.cell_houses[pos]:
+            if not self._positions[size * house + digit] and not self._placed[house] >> digit & 1:
+                raise Contradiction(f'Цифре {digit + 1} не осталось места в блоке {house}', pos, digit + 1, house)
 
-        for idx in range(9):
-            yield self.column(idx)
+    def _dirty_houses(self, technique):
+        """
+        Возвращает индексы блоков (в topology.houses), изменившихся с прошлого вызова для заданного метода решения.
+        :param technique: string
+            Название метода решения.
+        """
+        self._stamp += 1
+        since = self._seen_stamps.get(technique, 0)
+        self._seen_stamps[technique] = self._stamp
+
+        return [idx for idx, stamp in enumerate(self._house_stamps) if stamp >= since]
 
-        for idx in range(9):
-            yield self.square(idx)
+    def _mark_all_dirty(self):
+        """Помечает все блоки измененными и заново собирает очередь голых одиночек."""
+        popcount = self.topology.popcount
+        self._house_stamps = [self._stamp] * len(self.topology.houses)
+        self._singles = [pos for pos, mask in enumerate(self.masks) if popcount[mask] == 1]
+
+    def _eliminate(self, pos, bits):
+        """
+        Исключает цифры из кандидатов ячейки. Блоки ячейки помечаются измененными, а ячейка с единственным
+        оставшимся кандидатом ставится в очередь голых одиночек.
+        :param pos: integer
+            Позиция ячейки.
+        :param bits: integer
+            Маска исключаемых цифр.
+        :return: integer
+            Количество исключенных кандидатов.
+        :raises Contradiction: если у ячейки не осталось кандидатов либо цифре не осталось места в блоке ячейки.
+        """
+        mask = self.masks[pos]
+        removed = mask & bits
+        if removed:
+            mask &= ~bits
+            if not mask:
+                raise Contradiction(f'У ячейки {pos} не осталось кандидатов', pos)
+            t = self.topology
+            popcount = t.popcount
+            self.masks[pos] = mask
+            count = popcount[removed]
+            self.eliminations += count
+            idx_row, idx_col, idx_square = t.cell_houses[pos]
+            stamps = self._house_stamps
+            stamps[idx_row] = stamps[idx_col] = stamps[idx_square] = self._stamp
+            if popcount[mask] == 1:
+                self._singles.append(pos)
+
+            size = t.size
+            lowest_bit = t.lowest_bit
+            bit_row, bit_col, bit_square = t.cell_house_bits[pos]
+            row, col, square = size * idx_row, size * idx_col, size * idx_square
+            positions = self._positions
+            while removed:
+                digit = lowest_bit[removed]
+                removed &= removed - 1
+                where_row = positions[row + digit] = positions[row + digit] & ~bit_row
+                where_col = positions[col + digit] = positions[col + digit] & ~bit_col
+                where_square = positions[square + digit] = positions[square + digit] & ~bit_square
+                # последнее место цифры в блоке освобождается и при ее установке в соседней ячейке
+                if not (where_row and where_col and where_square):
+                    self._check_places(pos, digit)
+            return count
+        return 0
 
     def set_value(self, idx_row, idx_col, value):
         """
         Устанавливает значение ячейки на пересечении заданной строки и колонки.
         :param idx_row: integer
-            Индекс строки (0 - 8).
+            Индекс строки (0 - size - 1).
         :param idx_col: integer
-            Индекс колонки (0 - 8).
+            Индекс колонки (0 - size - 1).
         :param value: integer
-            Устанавливаемое значение ячейки (1 - 9)
+            Устанавливаемое значение ячейки (1 - size)
+        :raises Contradiction: если значение не является кандидатом ячейки либо установка значения приводит к
+            противоречию.
         """
 
-        self.cells[idx_row][idx_col].value = value
-        self.cells[idx_row][idx_col].choices = set()
+        t = self.topology
+        pos = idx_row * t.size + idx_col
+        bit = t.digit_bits[value]
+        if not self.masks[pos] & bit:
+            raise Contradiction(f'Цифра {value} невозможна в ячейке {pos}', pos, value)
+        self.values[pos] = value
+        house_row, house_col, house_square = t.cell_houses[pos]
+        placed = self._placed
+        placed[house_row] |= bit
+        placed[house_col] |= bit
+        placed[house_square] |= bit
+        self._remove_positions(pos, self.masks[pos])
+        self.masks[pos] = 0
         self.unsolved_cells -= 1
-        idx_square = (idx_row // 3) * 3 + idx_col // 3
+        stamps = self._house_stamps
+        stamps[house_row] = stamps[house_col] = stamps[house_square] = self._stamp
 
-        adjoined_cells = self.cells[idx_row] + [cell for cell in self.column(idx_col)] + \
-                         [cell for cell in self.square(idx_square)]
+        masks = self.masks
+        for peer in t.peers[pos]:
+            if masks[peer] & bit:
+                self._eliminate(peer, bit)
 
-        for cell in adjoined_cells:
-            if value in cell.choices:
-                cell.choices.remove(value)
+    def _solve_naked_subsets(self, size, technique):
+        """
+        Находит голые подмножества: size ячеек блока, кандидаты которых в совокупности составляют size цифр.
+        Эти цифры исключаются из остальных ячеек блока.
+        :param size: integer
+            Размер подмножества (2 - 4).
+        :param technique: string
+            Название метода решения для отслеживания изменившихся блоков.
+        """
+        houses = self.topology.houses
+        popcount = self.topology.popcount
+        masks = self.masks
+        dirty = self._dirty_houses(technique)
+
+        while dirty:
+            for idx in dirty:
+                house = houses[idx]
+                cells = [pos for pos in house if 2 <= popcount[masks[pos]] <= size]
+                if len(cells) < size:
+                    continue
+
+                for members, digits in _find_subsets([masks[pos] for pos in cells], size, popcount):
+                    subset = [cells[i] for i in range(len(cells)) if members >> i & 1]
+                    for pos in house:
+                        if masks[pos] & digits and pos not in subset:
+                            self._eliminate(pos, digits)
+
+            dirty = self._dirty_houses(technique)
+
+    def _solve_hidden_subsets(self, size, technique):
+        """
+        Находит скрытые подмножества: size цифр, которые возможны в блоке только в size ячейках. Остальные
+        кандидаты этих ячеек исключаются.
+        :param size: integer
+            Размер подмножества (2 - 4).
+        :param technique: string
+            Название метода решения для отслеживания изменившихся блоков.
+        """
+        t = self.topology
+        popcount = t.popcount
+        lowest_bit = t.lowest_bit
+        digit_range = range(t.size)
+        masks = self.masks
+        positions = self._positions
+        dirty = self._dirty_houses(technique)
+
+        while dirty:
+            for idx in dirty:
+                house = t.houses[idx]
+                offset = t.size * idx
+                digits = [digit for digit in digit_range if 2 <= popcount[positions[offset + digit]] <= size]
+                if len(digits) < size:
+                    continue
+
+                for members, where in _find_subsets([positions[offset + digit] for digit in digits], size, popcount):
+                    subset = 0
+                    for i, digit in enumerate(digits):
+                        if members >> i & 1:
+                            subset |= 1 << digit
+                    while where:
+                        pos = house[lowest_bit[where]]
+                        where &= where - 1
+                        if masks[pos] & ~subset:
+                            self._eliminate(pos, ~subset)
+
+            dirty = self._dirty_houses(technique)
 
     def solve_naked_pairs(self):
         """Находит голые пары и обновляет перечень кандидатов в ячейках."""
+        self._solve_naked_subsets(2, 'naked_pairs')
 
-        updated_cells = 1
+    def solve_naked_triples(self):
+        """Находит голые тройки и обновляет перечень кандидатов в ячейках."""
+        self._solve_naked_subsets(3, 'naked_triples')
 
-        while updated_cells:
-            updated_cells = 0
-            for house in self.houses():
-                pairs = [cell.choices for cell in house if len(cell.choices) == 2]
-                naked_pairs = []
-
-                for i in range(len(pairs)):
-                    for j in range(i + 1, len(pairs)):
-                        if pairs[i] == pairs[j]:
-                            naked_pairs.append(pairs[i])
-                            break
-
-                for cell in house:
-                    for pair in naked_pairs:
-                        if cell.choices != pair and not cell.choices.isdisjoint(pair):
-                            updated_cells += 1
-                            cell.choices -= pair
+    def solve_naked_quads(self):
+        """Находит голые четверки и обновляет перечень кандидатов в ячейках."""
+        self._solve_naked_subsets(4, 'naked_quads')
 
     def solve_hidden_pairs(self):
         """Находит скрытые пары и обновляет перечень кандидатов в ячейках."""
-        updated_cells = 1
-
-        while updated_cells:
-            updated_cells = 0
-            for cells in self.houses():
-                counter_pairs = collections.Counter()
-                counter_digits = collections.Counter()
-                for cell in cells:
-                    ls_choices = list(cell.choices)
-                    for i in range(len(ls_choices)):
-                        counter_digits[ls_choices[i]] += 1
-                        for j in range(i + 1, len(ls_choices)):
-                            counter_pairs[(ls_choices[i], ls_choices[j])] += 1
-
-                hidden_pairs = [set(key) for key, value in counter_pairs.items() if value == 2 and
-                                counter_digits[key[0]] == 2 and counter_digits[key[1]] == 2]
-
-                for cell in cells:
-                    for pair in hidden_pairs:
-                        if len(cell.choices) > 2 and pair <= cell.choices:
-                            cell.choices = cell.choices & pair
-                            updated_cells += 1
+        self._solve_hidden_subsets(2, 'hidden_pairs')
+
+    def solve_hidden_triples(self):
+        """Находит скрытые тройки и обновляет перечень кандидатов в ячейках."""
+        self._solve_hidden_subsets(3, 'hidden_triples')
 
+    def solve_hidden_quads(self):
+        """Находит скрытые четверки и обновляет перечень кандидатов в ячейках."""
+        self._solve_hidden_subsets(4, 'hidden_quads')
 
     def solve_naked_singles(self):
-        """Находит и заполняет голые одиночки."""
-        solved_cells = 1
+        """Находит и заполняет голые одиночки из очереди ячеек с единственным кандидатом."""
 
-        while solved_cells:
-            solved_cells = 0
-            for house in self.houses():
-                for cell in house:
-                    if len(cell.choices) == 1:
-                        self.set_value(cell.idx_row, cell.idx_col, cell.choices.pop())
-                        solved_cells += 1
+        t = self.topology
+        popcount = t.popcount
+        lowest_bit = t.lowest_bit
+        masks = self.masks
+        values = self.values
+        singles = self._singles
+
+        while singles:
+            pos = singles.pop()
+            if values[pos] == 0 and popcount[masks[pos]] == 1:
+                self.set_value(t.row_of[pos], t.column_of[pos], lowest_bit[masks[pos]] + 1)
 
     def solve_hidden_singles(self):
+        """Находит и заполняет скрытые одиночки."""
 
-        solved_cells = 1
+        t = self.topology
+        popcount = t.popcount
+        lowest_bit = t.lowest_bit
+        digit_range = range(t.size)
+        positions = self._positions
+        dirty = self._dirty_houses('hidden_singles')
 
-        while solved_cells:
-            solved_cells = 0
-            for cells in self.houses():
-                for i in range(9):
-                    reminder_set = cells[i].choices.copy()
-                    for j in range(9):
-                        if j == i:
-                            continue
-                        reminder_set -= cells[j].choices
+        while dirty:
+            for idx in dirty:
+                house = t.houses[idx]
+                offset = t.size * idx
 
-                    if len(reminder_set) == 1:
-                        self.set_value(cells[i].idx_row, cells[i].idx_col, reminder_set.pop())
-                        solved_cells += 1
+                for digit in digit_range:
+                    where = positions[offset + digit]
+                    if popcount[where] == 1:
+                        pos = house[lowest_bit[where]]
+                        self.set_value(t.row_of[pos], t.column_of[pos], digit + 1)
 
-    def solve_intersection_removal(self):
+            dirty = self._dirty_houses('hidden_singles')
 
-        solved = 1
+    def solve_intersection_removal(self):
+        """
+        Находит указывающие пары/тройки и сокращения блок-линия на отрезках (Topology.segments), обновляет перечень
+        кандидатов в ячейках. Цифра, которая в пределах линии (квадрата) возможна только в одном отрезке,
+        исключается из остальных ячеек квадрата (линии) этого отрезка.
+        """
 
-        while solved:
-            solved = 0
+        t = self.topology
+        lines = 2 * t.size
+        segments, segment_houses, segment_rests = t.segments, t.segment_houses, t.segment_rests
+        house_segments = t.house_segments
+        masks = self.masks
+        segment_masks = self._segment_masks
+        changed = bytearray(len(t.houses))
+        dirty = self._dirty_houses('intersection_removal')
+
+        while dirty:
+            # Маска отрезка - объединение кандидатов его ячеек. Ячейки отрезка меняются вместе с его линией и
+            # квадратом, поэтому пересчитываются только отрезки, у которых изменились оба блока.
+            for idx in dirty:
+                changed[idx] = 1
+            for idx in dirty:
+                if idx >= lines:
+                    break
+                for k in house_segments[idx][0]:
+                    if changed[segment_houses[k][1]]:
+                        mask = 0
+                        for pos in segments[k]:
+                            mask |= masks[pos]
+                        segment_masks[k] = mask
+
+            for idx in dirty:
+                changed[idx] = 0
+                # цифры линии исключаются из остальных ячеек квадрата отрезка, цифры квадрата - из остальных ячеек
+                # линии
+                rest = 1 if idx < lines else 0
+                for group in house_segments[idx]:
+                    # цифры, возможные ровно в одном отрезке группы
+                    once = twice = 0
+                    for k in group:
+                        mask = segment_masks[k]
+                        twice |= once & mask
+                        once |= mask
+                    single = once & ~twice
+                    if not single:
+                        continue
+                    for k in group:
+                        unique = segment_masks[k] & single
+                        if unique:
+                            for pos in segment_rests[k][rest]:
+                                if masks[pos] & unique:
+                                    self._eliminate(pos, unique)
+
+            dirty = self._dirty_houses('intersection_removal')
+
+    def _solve_fish(self, size, technique):
+        """
+        Находит "рыбу" размера size: size строк (столбцов), в которых цифра возможна только в size столбцах
+        (строках) в совокупности. Из остальных ячеек этих столбцов (строк) цифра исключается.
+        :param size: integer
+            Размер: 2 - X-Wing, 3 - Swordfish, 4 - Jellyfish.
+        :param technique: string
+            Название метода решения для отслеживания изменившихся блоков.
+        """
+        t = self.topology
+        popcount = t.popcount
+        lowest_bit = t.lowest_bit
+        houses = t.houses
+        n = t.size
+        positions = self._positions
+        masks = self.masks
+        dirty = self._dirty_houses(technique)
+
+        while dirty:
+            # Рыба из неизменившихся базовых линий уже была обработана на предыдущем проходе.
+            dirty_lines = 0
+            for idx in dirty:
+                if idx < 2 * n:
+                    dirty_lines |= 1 << idx
+
+            # Базовые линии - строки (блоки 0 - n - 1) и покрывающие - столбцы (блоки n - 2n - 1), затем наоборот.
+            # Маска позиций цифры в строке - маска столбцов, в столбце - маска строк.
+            for base, cover in ((0, n), (n, 0)):
+                for digit in range(n):
+                    lines = [line for line in range(n) if 2 <= popcount[positions[n * (base + line) + digit]] <= size]
+                    if len(lines) < size:
+                        continue
+
+                    bit = 1 << digit
+                    for members, covered in _find_subsets([positions[n * (base + line) + digit] for line in lines],
+                                                          size, popcount):
+                        base_lines = 0
+                        for i, line in enumerate(lines):
+                            if members >> i & 1:
+                                base_lines |= 1 << line
+                        if not (dirty_lines >> base) & base_lines:
+                            continue
 
-            # 1. Обходим квадраты
-            for idx in range(9):
-                cells = self.square(idx)
+                        while covered:
+                            house = houses[cover + lowest_bit[covered]]
+                            covered &= covered - 1
+                            for i, pos in enumerate(house):
+                                if not base_lines >> i & 1 and masks[pos] & bit:
+                                    self._eliminate(pos, bit)
 
-                rows_choices = [set(), set(), set()]
-                cols_choices = [set(), set(), set()]
+            dirty = self._dirty_houses(technique)
 
-                min_row = cells[0].idx_row
-                min_col = cells[0].idx_col
+    def solve_x_wing(self):
+        """Находит связанные пары (X-Wing) и обновляет перечень кандидатов в ячейках."""
+        self._solve_fish(2, 'x_wing')
 
-                for cell in cells:
-                    rows_choices[cell.idx_row - min_row] |= cell.choices
-                    cols_choices[cell.idx_col - min_col] |= cell.choices
+    def solve_swordfish(self):
+        """Находит связанные тройки (Swordfish) и обновляет перечень кандидатов в ячейках."""
+        self._solve_fish(3, 'swordfish')
 
-                rows_unique = copy.deepcopy(rows_choices)
-                cols_unique = copy.deepcopy(cols_choices)
+    def solve_jellyfish(self):
+        """Находит связанные четверки (Jellyfish) и обновляет перечень кандидатов в ячейках."""
+        self._solve_fish(4, 'jellyfish')
 
-                for i in range(3):
-                    for j in range(3):
-                        if i == j:
-                            continue
-                        rows_unique[i] -= rows_choices[j]
-                        cols_unique[i] -= cols_choices[j]
-
-                for i in range(3):
-                    while len(rows_unique[i]) > 0:
-                        value = rows_unique[i].pop()
-                        idx_row = min_row + i
-                        for c in self.cells[idx_row]:
-                            if c.idx_square != idx and value in c.choices:
-                                c.choices.remove(value)
-                                solved += 1
-
-                    while len(cols_unique[i]) > 0:
-                        value = cols_unique[i].pop()
-                        idx_col = min_col + i
-                        for c in self.column(idx_col):
-                            if c.idx_square != idx and value in c.choices:
-                                c.choices.remove(value)
-                                solved += 1
-
-            # Обходим строки
-            for idx in range(9):
-                square_choices = [set(), set(), set()]
-                min_square = self.cells[idx][0].idx_square
-
-                for cell in self.cells[idx]:
-                    square_choices[cell.idx_square - min_square] |= cell.choices
-
-                square_unique = copy.deepcopy(square_choices)
-                for i in range(3):
-                    for j in range(3):
-                        if i == j:
-                            continue
-                        square_unique[i] -= square_choices[j]
-
-                for i in range(3):
-                    while len(square_unique[i]) > 0:
-                        value = square_unique[i].pop()
-                        idx_square = min_square + i
-                        for c in self.square(idx_square):
-                            if c.idx_row != idx and value in c.choices:
-                                c.choices.remove(value)
-                                solved += 1
-
-            # Обходим столбцы
-            for idx in range(9):
-                square_choices = [set(), set(), set()]
-                cells = self.column(idx)
-                min_square = cells[0].idx_square
-
-                for cell in cells:
-                    if cell.idx_square == min_square:
-                        square_choices[0] |= cell.choices
-                    elif (cell.idx_square - min_square) == 3:
-                        square_choices[1] |= cell.choices
-                    else:
-                        square_choices[2] |= cell.choices
-
-                square_unique = copy.deepcopy(square_choices)
-                for i in range(3):
-                    for j in range(3):
-                        if i == j:
-                            continue
-                        square_unique[i] -= square_choices[j]
-
-                for i in range(3):
-                    while len(square_unique[i]) > 0:
-                        value = square_unique[i].pop()
-                        if i == 0:
-                            idx_square = min_square
-                        elif i == 1:
-                            idx_square = min_square + 3
-                        else:
-                            idx_square = min_square + 6
-
-                        for c in self.square(idx_square):
-                            if c.idx_col != idx and value in c.choices:
-                                c.choices.remove(value)
-                                solved += 1
+    def _apply(self, technique):
+        """
+        Применяет метод решения, при подключенном сборщике статистики - с замером времени и результатов.
+        :param technique: function
+            Метод решения - функция, принимающая Sudoku.
+        :return: bool
+            True, если метод исключил кандидаты либо установил значения.
+        """
+        stats = self.stats
+        eliminations = self.eliminations
+        unsolved = self.unsolved_cells
+        if self._trace is not None:
+            # блоки, измененные методом, получат метку не меньше этой
+            self._stamp += 1
+            since = self._stamp
+        if stats is None:
+            technique(self)
+        else:
+            start = time.perf_counter()
+            technique(self)
+            stats.record(technique.__name__, time.perf_counter() - start, self.eliminations - eliminations,
+                         unsolved - self.unsolved_cells)
+
+        if self.eliminations == eliminations and self.unsolved_cells == unsolved:
+            return False
+
+        self._used[technique.__name__] = None
+        if self._trace is not None:
+            houses = 0
+            for idx, stamp in enumerate(self._house_stamps):
+                if stamp >= since:
+                    houses |= 1 << idx
+            self._trace.append(Step(technique.__name__, houses, self.eliminations - eliminations,
+                                    unsolved - self.unsolved_cells))
+        return True
+
+    def propagate(self, scheduler=None, search=False):
+        """
+        Применяет логические методы решения, пока они дают результат, в порядке, заданном планировщиком.
+        :param scheduler: TechniqueScheduler
+            Планировщик методов решения. По умолчанию - TechniqueScheduler.default().
+        :param search: bool
+            Применять только методы для узлов поиска (TechniqueScheduler.search_techniques).
+        """
+        if scheduler is None:
+            scheduler = _DEFAULT_SCHEDULER
+        scheduler.run(self, search)
 
-    def solve_x_wing(self):
-        """Находит связанные пары и обновляет перечень кандидатов в ячейках."""
-
-        solved = 1
-
-        while solved:
-            solved = 0
-            row_counters = [dict() for i in range(9)]
-            col_counters = copy.deepcopy(row_counters)
-
-            for row in self.cells:
-                for cell in row:
-                    for value in cell.choices:
-                        row_counters[cell.idx_row].setdefault(value, [])
-                        col_counters[cell.idx_col].setdefault(value, [])
-                        row_counters[cell.idx_row][value].append(cell.idx_col)
-                        col_counters[cell.idx_col][value].append(cell.idx_row)
-
-            row_pairs = [{k for k,v in row_counters[i].items() if len(v) == 2} for i in range(9)]
-            col_pairs = [{k for k,v in col_counters[i].items() if len(v) == 2} for i in range(9)]
-
-            for i in range(9):
-                for j in range(i + 1, 9):
-                    # связанные пары по строкам
-                    common_pairs = row_pairs[i] & row_pairs[j]
-                    for value in common_pairs:
-                        if row_counters[i][value] == row_counters[j][value]:
-                            for idx_col in row_counters[i][value]:
-                                for cell in self.column(idx_col):
-                                    if cell.idx_row not in [i, j] and value in cell.choices:
-                                        cell.choices.remove(value)
-                                        solved += 1
-
-                    # связанные пары по столбцам
-                    common_pairs = col_pairs[i] & col_pairs[j]
-                    for value in common_pairs:
-                        if col_counters[i][value] == col_counters[j][value]:
-                            for idx_row in col_counters[i][value]:
-                                for cell in self.cells[idx_row]:
-                                    if cell.idx_col not in [i, j] and value in cell.choices:
-                                        cell.choices.remove(value)
-                                        solved += 1
-
-
-    def solve(self):
-        """Решает судоку."""
-        solved = 1
-        advanced = False
-
-        while solved or advanced:
-            unsolved_before = self.unsolved_cells
-
-            self.solve_naked_pairs()
-            if advanced:
-                self.solve_hidden_pairs()
-                self.solve_intersection_removal()
-                self.solve_x_wing()
+    def snapshot(self):
+        """
+        Возвращает снимок состояния головоломки - значения и маски кандидатов ячеек, маски позиций и установленных
+        цифр в блоках в виде компактных буферов и количество неразгаданных ячеек.
+        :return: Snapshot
+        """
+        typecode = self.topology.typecode
+        return Snapshot(bytes(self.values), array.array(typecode, self.masks), array.array(typecode, self._positions),
+                        array.array(typecode, self._placed), self.unsolved_cells)
 
+    def restore(self, snapshot):
+        """
+        Восстанавливает состояние головоломки из снимка, полученного методом snapshot(). Списки значений и масок
+        изменяются на месте, так как они разделяются с объектами Cell.
+        :param snapshot: Snapshot
+        """
+        self.values[:] = snapshot.values
+        self.masks[:] = snapshot.masks
+        self._positions[:] = snapshot.positions
+        self._placed[:] = snapshot.placed
+        self.unsolved_cells = snapshot.unsolved_cells
+        self._mark_all_dirty()
+
+    def _search(self):
+        """
+        Поиск с возвратом: выбирает неразгаданную ячейку с наименьшим числом кандидатов, перебирает их и после
+        каждой подстановки применяет методы решения для узлов поиска (TechniqueScheduler.search_techniques).
+        Тупик обнаруживается по исключению Contradiction при первом же противоречивом исключении кандидата.
+        :return: bool
+            True, если решение найдено.
+        """
+        if self.stats is not None:
+            self.stats.search_nodes += 1
+        if self._budget is not None:
+            self._budget.node()
+
+        try:
+            self.propagate(self._scheduler, search=True)
+        except Contradiction:
+            return False
+        if self.unsolved_cells == 0:
+            return True
+
+        best_pos, best_count = self._choose_cell()
+        t = self.topology
+        snapshot = self.snapshot()
+        choices = self.masks[best_pos]
+        while choices:
+            digit = t.lowest_bit[choices] + 1
+            choices &= choices - 1
+            if self._trace is not None:
+                idx_row, idx_col, idx_square = t.cell_houses[best_pos]
+                self._trace.append(Step('search', 1 << idx_row | 1 << idx_col | 1 << idx_square, 0, 1))
+            try:
+                self.set_value(t.row_of[best_pos], t.column_of[best_pos], digit)
+            except Contradiction:
+                pass
+            else:
+                if self._search():
+                    return True
+            self.restore(snapshot)
+
+        return False
+
+    def _choose_cell(self):
+        """Возвращает позицию неразгаданной ячейки с наименьшим числом кандидатов и число ее кандидатов."""
+        popcount = self.topology.popcount
+        values = self.values
+        masks = self.masks
+        best_pos = -1
+        best_count = self.topology.size + 1
+        for pos in range(self.topology.cells):
+            if values[pos] == 0 and popcount[masks[pos]] < best_count:
+                best_pos = pos
+                best_count = popcount[masks[pos]]
+                if best_count <= 1:
+                    break
+        return best_pos, best_count
+
+    def _propagate_singles(self):
+        """Применяет голые и скрытые одиночки, пока они дают результат."""
+        unsolved = None
+        while self.unsolved_cells != unsolved:
+            unsolved = self.unsolved_cells
             self.solve_naked_singles()
-            if self.unsolved_cells == 0:
-                break
-
             self.solve_hidden_singles()
+
+    def _count_solutions(self, limit):
+        # при подсчете решений дешевле перебрать больше узлов, применяя в каждом только одиночки
+        try:
+            self._propagate_singles()
+        except Contradiction:
+            return 0
+        if self.unsolved_cells == 0:
+            return 1
+
+        best_pos, best_count = self._choose_cell()
+        t = self.topology
+        count = 0
+        snapshot = self.snapshot()
+        choices = self.masks[best_pos]
+        while choices and count < limit:
+            digit = t.lowest_bit[choices] + 1
+            choices &= choices - 1
+            try:
+                self.set_value(t.row_of[best_pos], t.column_of[best_pos], digit)
+            except Contradiction:
+                pass
+            else:
+                count += self._count_solutions(limit - count)
+            self.restore(snapshot)
+
+        return count
+
+    def count_solutions(self, limit=2):
+        """
+        Считает решения головоломки из текущего состояния. Подсчет останавливается, как только найдено limit
+        решений, поэтому для проверки единственности решения достаточно limit=2. Состояние головоломки не
+        изменяется.
+        :param limit: integer
+            Наибольшее количество искомых решений.
+        :return: integer
+            Количество решений, но не более limit.
+        """
+        if self._contradiction is not None:
+            return 0
+
+        stats = self.stats
+        self.stats = None
+        snapshot = self.snapshot()
+        try:
+            return self._count_solutions(limit)
+        finally:
+            self.restore(snapshot)
+            self.stats = stats
+
+    def solve(self, search=True, timeout=None, max_rounds=None, max_nodes=None, trace=False, scheduler=None):
+        """
+        Решает судоку.
+        :param search: bool
+            Если логических методов недостаточно, продолжить решение поиском с возвратом. Если решения не
+            существует, головоломка остается в состоянии после применения логических методов.
+        :param timeout: float
+            Наибольшее время решения в секундах.
+        :param max_rounds: integer
+            Наибольшее количество проходов логических методов (с учетом проходов в узлах поиска).
+        :param max_nodes: integer
+            Наибольшее количество узлов поиска.
+        :param trace: bool
+            Записывать шаги решения и вычислить оценку сложности.
+        :param scheduler: TechniqueScheduler
+            Планировщик логических методов решения. По умолчанию - TechniqueScheduler.default().
+        :return: SolveResult
+            При исчерпании любого из бюджетов решение прерывается, а головоломка остается в состоянии, полученном
+            логическими методами: предположения, сделанные при поиске, в ней не сохраняются.
+        """
+        start = time.perf_counter()
+        unsolved = self.unsolved_cells
+        if self.stats is not None:
+            self.stats.grids += 1
+        if timeout is not None or max_rounds is not None or max_nodes is not None:
+            self._budget = _Budget(timeout, max_rounds, max_nodes)
+        self._used = {}
+        if trace:
+            self._trace = []
+        self._scheduler = scheduler
+
+        snapshot = None
+        try:
+            if self._contradiction is not None:
+                raise self._contradiction
+            self.propagate(scheduler)
             if self.unsolved_cells == 0:
-                break
+                status = SOLVED
+            elif not search:
+                status = UNSOLVED
+            else:
+                snapshot = self.snapshot()
+                if self._search():
+                    status = SOLVED
+                else:
+                    status = NO_SOLUTION
+                    self.restore(snapshot)
+        except Contradiction:
+            # противоречие в исходной головоломке либо после логических методов; в узлах поиска оно перехватывается
+            status = NO_SOLUTION
+        except _BudgetExceeded as exc:
+            status = exc.status
+            if snapshot is not None:
+                self.restore(snapshot)
+        finally:
+            self._budget = None
+            self._scheduler = None
+
+        steps = self._trace
+        self._trace = None
+        score = None
+        if steps is not None:
+            score = sum(TECHNIQUE_WEIGHTS.get(step.technique, 0) for step in steps)
+        return SolveResult(status, unsolved - self.unsolved_cells, tuple(self._used), time.perf_counter() - start,
+                           steps, score)
+
+    def grade(self):
+        """
+        Решает судоку с записью шагов и возвращает оценку сложности - сумму весов TECHNIQUE_WEIGHTS всех шагов
+        решения. Подробности решения возвращает solve(trace=True).
+        :return: integer
+        """
+        return self.solve(trace=True).score
 
-            solved = unsolved_before - self.unsolved_cells
 
-            if solved == 0:
-                advanced = not advanced
+# Планировщик, которым Sudoku.solve() и Sudoku.propagate() пользуются по умолчанию.
+_DEFAULT_SCHEDULER = TechniqueScheduler.default()
 
 
 class Cell:
     """
     Класс ячейки судоку.
 
+    Ячейка является представлением элемента плоских массивов значений и масок кандидатов. Ячейки судоку разделяют
+    эти массивы с объектом Sudoku, отдельно созданная ячейка хранит собственные. Индексы строки, столбца и квадрата
+    вычисляются по позиции ячейки и топологии судоку.
+
     Атрибуты
     --------
     value: integer
-        Значение в ячейке. Может равняться 0, если значение еще не разгадано, либо числу от 1 до 9.
-    choices: set
-        Содержит перечень возможных значений для заполнения в ячейке. Если ячейка разгадана, то содержит пустое
-        множество.
+        Значение в ячейке. Может равняться 0, если значение еще не разгадано, либо числу от 1 до size.
+    choices: frozenset
+        Содержит перечень возможных значений для заполнения в ячейке (только для чтения). Если ячейка разгадана,
+        то содержит пустое множество.
+    mask: integer
+        Битовая маска возможных значений ячейки.
+    pos: integer
+        Позиция ячейки в плоских массивах значений и масок.
     idx_row: integer
         Индекс строки судоку, которой принадлежит ячейка.
     idx_col: integer
@@ -394,22 +1482,62 @@ class Cell:
     idx_square: integer
         Индекс квадрата судоку, которому принадлежит ячейка.
     """
-    def __init__(self, value=None, idx_row=0, idx_col=0):
+    __slots__ = ('_values', '_masks', '_topology', 'pos')
 
+    def __init__(self, value=None, idx_row=0, idx_col=0, size=9):
+        """
+        :param size: integer
+            Размер судоку, которому принадлежит ячейка (один из SIZES).
+        """
+        t = self._topology = topology(size)
         if value is None:
-            self.value = 0
+            value = 0
         else:
-            if not isinstance(value, int):
-                raise TypeError('Значением ячейки может быть только целое число')
-            elif value not in range(10):
-                raise ValueError('Значение ячейки должно находится в интервале 0-9')
-            self.value = int(value)
-
-        if self.value:
-            self.choices = set()
-        else:
-            self.choices = set(range(1, 10))
+            _check_value(value, size)
+
+        self.pos = idx_row * size + idx_col
+        # отдельной ячейке достаточно хранить только свои значение и маску
+        self._values = {self.pos: value}
+        self._masks = {self.pos: 0 if value else t.full_mask}
 
-        self.idx_row = idx_row
-        self.idx_col = idx_col
-        self.idx_square = (idx_row // 3) * 3 + idx_col // 3
+    @classmethod
+    def view(cls, sudoku, idx_row, idx_col):
+        """
+        Создает ячейку, отображающую состояние заданной ячейки судоку.
+        :param sudoku: Sudoku
+            Судоку, которому принадлежит ячейка.
+        :param idx_row: integer
+            Индекс строки (0 - size - 1).
+        :param idx_col: integer
+            Индекс колонки (0 - size - 1).
+        """
+        cell = cls.__new__(cls)
+        cell._values = sudoku.values
+        cell._masks = sudoku.masks
+        cell._topology = sudoku.topology
+        cell.pos = idx_row * sudoku.topology.size + idx_col
+        return cell
+
+    @property
+    def value(self):
+        return self._values[self.pos]
+
+    @property
+    def mask(self):
+        return self._masks[self.pos]
+
+    @property
+    def choices(self):
+        return self._topology.digits(self._masks[self.pos])
+
+    @property
+    def idx_row(self):
+        return self._topology.row_of[self.pos]
+
+    @property
+    def idx_col(self):
+        return self._topology.column_of[self.pos]
+
+    @property
+    def idx_square(self):
+        return self._topology.square_of[self.pos]
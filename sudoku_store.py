@@ -0,0 +1,160 @@
+"""
+Хранилище результатов решения судоку на диске (SQLite).
+
+Результат хранится по ключу - строке из 81 цифры головоломки (построчно, 0 - пустая ячейка). Таблица организована
+по первичному ключу (WITHOUT ROWID), поэтому поиск результата - один проход по B-дереву без отдельного индекса.
+Повторный запуск пакетного решения (sudoku_batch) пропускает головоломки, результат которых уже известен, а новые
+результаты записываются группами, по одной транзакции на группу.
+
+Пример использования:
+    with ResultStore('results.db') as store:
+        batch = solve_file('p096_sudoku.txt', store=store)
+"""
+import collections
+import sqlite3
+import time
+
+from sudoku_solver import NO_SOLUTION, SOLVED
+
+# Сохраненный результат: решение (список из 81 значения, построчно), состояние решения (sudoku_solver.SOLVED и
+# т.п.), время решения в секундах и время записи (секунды от начала эпохи).
+StoredResult = collections.namedtuple('StoredResult', ['values', 'status', 'elapsed', 'updated'])
+
+# Состояния, которые не изменятся при повторном решении: результаты с ними можно брать из хранилища. Решение,
+# прерванное по времени или лимитам, при повторном запуске выполняется заново.
+FINAL_STATUSES = frozenset((SOLVED, NO_SOLUTION))
+
+# Наибольшее количество ключей в одном запросе get_many (ограничение SQLite на число параметров запроса).
+_MAX_VARIABLES = 500
+
+# Таблицы перевода значений ячеек в цифры ключа и обратно.
+_ENCODE_TABLE = bytes.maketrans(bytes(range(10)), b'0123456789')
+_DECODE_TABLE = bytes.maketrans(b'0123456789', bytes(range(10)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    puzzle TEXT PRIMARY KEY,
+    solution TEXT NOT NULL,
+    status TEXT NOT NULL,
+    elapsed REAL NOT NULL,
+    updated REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def grid_key(grid):
+    """
+    Возвращает ключ головоломки в хранилище - строку из 81 цифры.
+    :param grid: list
+        Матрица 9x9 либо плоская последовательность из 81 значения ячеек (в том числе bytes и memoryview).
+    :return: string
+    """
+    if len(grid) != 81:
+        grid = [value for row in grid for value in row]
+    return bytes(grid).translate(_ENCODE_TABLE).decode('ascii')
+
+
+def _decode(solution):
+    """Переводит строку цифр из хранилища в список значений ячеек."""
+    return list(solution.encode('ascii').translate(_DECODE_TABLE))
+
+
+class ResultStore:
+    """
+    Хранилище результатов решения судоку в файле SQLite.
+
+    Атрибуты
+    --------
+    path: string
+        Путь к файлу базы данных.
+    """
+    def __init__(self, path):
+        """
+        :param path: string
+            Путь к файлу базы данных. Файл создается, если его нет; ':memory:' - хранилище в памяти.
+        """
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        # WAL и synchronous=NORMAL: транзакция записи не ждет синхронизации файла на каждом коммите, а при сбое
+        # теряются только последние транзакции, но не целостность базы
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        with self._connection:
+            self._connection.execute(_SCHEMA)
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def __contains__(self, key):
+        return self._connection.execute('SELECT 1 FROM results WHERE puzzle = ?', (key,)).fetchone() is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Закрывает базу данных."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def get(self, key):
+        """
+        Возвращает сохраненный результат головоломки.
+        :param key: string
+            Ключ головоломки (grid_key).
+        :return: StoredResult
+            Результат либо None, если головоломки нет в хранилище.
+        """
+        row = self._connection.execute(
+            'SELECT solution, status, elapsed, updated FROM results WHERE puzzle = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return StoredResult(_decode(row[0]), row[1], row[2], row[3])
+
+    def get_many(self, keys):
+        """
+        Возвращает сохраненные результаты группы головоломок.
+        :param keys: iterable
+            Ключи головоломок (grid_key).
+        :return: dict
+            Ключ -> StoredResult для головоломок, найденных в хранилище.
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        for start in range(0, len(keys), _MAX_VARIABLES):
+            part = keys[start:start + _MAX_VARIABLES]
+            rows = self._connection.execute(
+                'SELECT puzzle, solution, status, elapsed, updated FROM results '
+                f'WHERE puzzle IN ({",".join("?" * len(part))})', part)
+            for key, solution, status, elapsed, updated in rows:
+                found[key] = StoredResult(_decode(solution), status, elapsed, updated)
+        return found
+
+    def put(self, key, values, status, elapsed=0.0):
+        """
+        Сохраняет результат головоломки, заменяя прежний.
+        :param key: string
+            Ключ головоломки (grid_key).
+        :param values: list
+            Решение - плоская последовательность из 81 значения.
+        :param status: string
+            Состояние решения (sudoku_solver.SOLVED и т.п.).
+        :param elapsed: float
+            Время решения в секундах.
+        """
+        self.put_many([(key, values, status, elapsed)])
+
+    def put_many(self, records):
+        """
+        Сохраняет результаты группы головоломок в одной транзакции: при ошибке не сохраняется ни один из них.
+        :param records: iterable
+            Кортежи (ключ, решение, состояние, время решения) - параметры put.
+        """
+        updated = time.time()
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO results (puzzle, solution, status, elapsed, updated) VALUES (?, ?, ?, ?, ?)',
+                ((key, grid_key(values), status, elapsed, updated) for key, values, status, elapsed in records))
@@ -0,0 +1,146 @@
+"""
+Векторизованное решение большого числа судоку средствами NumPy.
+
+Все головоломки пакета хранятся в массивах формы (N, 81): значения ячеек и битовые маски кандидатов. Установка
+значений, голые и скрытые одиночки применяются ко всем головоломкам сразу операциями над массивами. Головоломки,
+для которых одиночки перестали давать результат, выбывают из активного набора и дорешиваются Sudoku.solve().
+
+Модулю требуется пакет numpy.
+"""
+import collections
+
+import numpy
+
+from sudoku_solver import DIGIT_BITS, FULL_MASK, HOUSES, NO_SOLUTION, PEERS, Contradiction, Sudoku
+
+# Состояния головоломок пакета.
+ACTIVE = 0
+SOLVED = 1
+UNSOLVED = 2
+INVALID = 3
+
+# Результат решения пакета: значения ячеек (N, 81) и состояния головоломок (N,).
+BatchSolution = collections.namedtuple('BatchSolution', ['values', 'status'])
+
+_PEERS = numpy.array(PEERS, dtype=numpy.intp)
+_HOUSES = numpy.array(HOUSES, dtype=numpy.intp)
+_DIGIT_BITS = numpy.array(DIGIT_BITS, dtype=numpy.uint16)
+_DIGIT_SHIFTS = numpy.arange(9, dtype=numpy.uint16)
+
+# Значение ячейки по маске из одного бита.
+_BIT_DIGITS = numpy.zeros(FULL_MASK + 1, dtype=numpy.uint8)
+_BIT_DIGITS[_DIGIT_BITS[1:]] = numpy.arange(1, 10, dtype=numpy.uint8)
+
+
+def _as_values(grids):
+    """Преобразует головоломки в массив значений (N, 81) типа uint8."""
+    if hasattr(grids, 'to_numpy'):
+        grids = grids.to_numpy()
+    values = numpy.array(grids, dtype=numpy.uint8).reshape(-1, 81)
+    if values.size and values.max() > 9:
+        raise ValueError('Значение ячейки должно находится в интервале 0-9')
+    return values
+
+
+def _step(values):
+    """
+    Выполняет один шаг распространения ограничений для активных головоломок.
+    :param values: numpy.ndarray
+        Значения ячеек активных головоломок (k, 81). Изменяется на месте.
+    :return: numpy.ndarray
+        Состояния головоломок (k,) после шага.
+    """
+    bits = _DIGIT_BITS[values]
+    # Исключение значений, установленных в соседних ячейках - то же, что делает Sudoku.set_value().
+    masks = numpy.where(values == 0, FULL_MASK & ~numpy.bitwise_or.reduce(bits[:, _PEERS], axis=2), 0)
+    masks = masks.astype(numpy.uint16)
+
+    house_bits = bits[:, _HOUSES]
+    placed = numpy.bitwise_or.reduce(house_bits, axis=2)
+    # Противоречия: повтор значения в блоке, ячейка без кандидатов, цифра без места в блоке.
+    invalid = (house_bits.sum(axis=2, dtype=numpy.uint16) != placed).any(axis=1)
+    invalid |= ((values == 0) & (masks == 0)).any(axis=1)
+
+    # planes[g, h, i, d] - возможна ли цифра d + 1 в i-й ячейке блока h головоломки g
+    planes = (masks[:, _HOUSES][..., None] >> _DIGIT_SHIFTS) & 1
+    counts = planes.sum(axis=2)
+    missing = (counts == 0) & (((placed[..., None] >> _DIGIT_SHIFTS) & 1) == 0)
+    invalid |= missing.any(axis=(1, 2))
+
+    # Голые одиночки.
+    forced = numpy.where((masks & (masks - 1)) == 0, masks, 0).astype(numpy.uint16)
+
+    # Скрытые одиночки: позиция единственной ячейки блока, в которой возможна цифра.
+    grid_idx, house_idx, digit_idx = numpy.nonzero(counts == 1)
+    cell_idx = planes[grid_idx, house_idx, :, digit_idx].argmax(axis=1)
+    numpy.bitwise_or.at(forced, (grid_idx, _HOUSES[house_idx, cell_idx]), _DIGIT_BITS[digit_idx + 1])
+
+    # Ячейке предписано несколько разных значений.
+    invalid |= ((forced & (forced - 1)) != 0).any(axis=1)
+
+    status = numpy.full(len(values), ACTIVE, dtype=numpy.uint8)
+    status[(values != 0).all(axis=1)] = SOLVED
+    status[~(forced != 0).any(axis=1) & (status == ACTIVE)] = UNSOLVED
+    status[invalid] = INVALID
+
+    place = (forced != 0) & (status == ACTIVE)[:, None]
+    values[place] = _BIT_DIGITS[forced[place]]
+
+    return status
+
+
+def propagate(grids):
+    """
+    Применяет установку значений, голые и скрытые одиночки ко всем головоломкам пакета до неподвижной точки.
+    :param grids: массив формы (N, 81) или (N, 9, 9), последовательность головоломок либо sudoku_loader.GridArray
+    :return: BatchSolution
+        Состояние SOLVED - головоломка решена, UNSOLVED - одиночки не дают результата, INVALID - обнаружено
+        противоречие (значения ячеек такой головоломки возвращаются в исходном виде).
+    """
+    original = _as_values(grids)
+    values = original.copy()
+    status = numpy.full(len(values), ACTIVE, dtype=numpy.uint8)
+
+    active = numpy.arange(len(values))
+    active_values = values[active]
+    while active.size:
+        active_status = _step(active_values)
+
+        done = active_status != ACTIVE
+        if done.any():
+            finished = active[done]
+            values[finished] = active_values[done]
+            status[finished] = active_status[done]
+            active = active[~done]
+            active_values = active_values[~done]
+
+    invalid = status == INVALID
+    values[invalid] = original[invalid]
+
+    return BatchSolution(values, status)
+
+
+def solve_batch(grids):
+    """
+    Решает пакет головоломок: сначала векторизованно применяет одиночки, затем дорешивает оставшиеся головоломки
+    методом Sudoku.solve(). Головоломка, для которой поиск доказал отсутствие решения, получает состояние INVALID.
+    :param grids: массив формы (N, 81) или (N, 9, 9), последовательность головоломок либо sudoku_loader.GridArray
+    :return: BatchSolution
+    """
+    values, status = propagate(grids)
+
+    for idx in numpy.nonzero(status == UNSOLVED)[0]:
+        try:
+            sudoku = Sudoku(values[idx].tolist())
+        except Contradiction:
+            status[idx] = INVALID
+            continue
+        result = sudoku.solve()
+        values[idx] = sudoku.values
+        if sudoku.unsolved_cells == 0:
+            status[idx] = SOLVED
+        elif result.status == NO_SOLUTION:
+            # поиск доказал, что решения нет; остальные состояния (исчерпан бюджет) оставляют UNSOLVED
+            status[idx] = INVALID
+
+    return BatchSolution(values, status)
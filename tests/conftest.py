@@ -49,4 +49,18 @@ def init_sudoku_solution():
         [3, 7, 2, 6, 8, 9, 5, 1, 4],
         [8, 1, 4, 2, 5, 3, 7, 6, 9],
         [6, 9, 5, 4, 1, 7, 3, 8, 2]
-    ]
\ No newline at end of file
+    ]
+
+@pytest.fixture
+def hard_sudoku():
+    return [
+        [8, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 3, 6, 0, 0, 0, 0, 0],
+        [0, 7, 0, 0, 9, 0, 2, 0, 0],
+        [0, 5, 0, 0, 0, 7, 0, 0, 0],
+        [0, 0, 0, 0, 4, 5, 7, 0, 0],
+        [0, 0, 0, 1, 0, 0, 0, 3, 0],
+        [0, 0, 1, 0, 0, 0, 0, 6, 8],
+        [0, 0, 8, 5, 0, 0, 0, 1, 0],
+        [0, 9, 0, 0, 0, 0, 4, 0, 0]
+    ]
@@ -0,0 +1,34 @@
+import pytest
+from benchmark import CORPORA, GENERATED_GIVENS, TECHNIQUES, bench_corpus, compare, load_corpus, percentile
+
+
+def test_percentile():
+    samples = list(range(1, 101))
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
+    assert percentile([], 50) == 0.0
+
+
+@pytest.mark.parametrize('name', CORPORA)
+def test_load_corpus(name):
+    corpus = load_corpus(name)
+    assert corpus
+    assert all(len(grid) == 81 for grid in corpus)
+    if name in GENERATED_GIVENS:
+        assert all(sum(value != 0 for value in grid) == GENERATED_GIVENS[name] for grid in corpus)
+        assert corpus == load_corpus(name)
+
+
+def test_bench_corpus():
+    results = bench_corpus(load_corpus('pathological'), repeat=1)
+    assert set(results) == {'init', 'solve'} | set(TECHNIQUES)
+    assert results['solve']['count'] == 2
+    assert results['solve']['p99'] >= results['solve']['p50'] > 0
+
+
+def test_compare():
+    baseline = {'corpora': {'euler': {'solve': {'p50': 1.0}, 'init': {'p50': 1.0}}}}
+    current = {'corpora': {'euler': {'solve': {'p50': 1.5}, 'init': {'p50': 1.1}}, 'hard': {'solve': {'p50': 9.0}}}}
+    regressions = compare(current, baseline, threshold=0.2)
+    assert len(regressions) == 1
+    assert regressions[0].startswith('euler/solve')
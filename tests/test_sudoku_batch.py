@@ -0,0 +1,67 @@
+import pytest
+from sudoku_batch import WorkerStats, solve_file, solve_grid, solve_grids
+from sudoku_parser import iter_grids
+from sudoku_solver import NO_SOLUTION
+
+
+def test_solve_grid(init_sudoku, init_sudoku_solution):
+    result = solve_grid(init_sudoku)
+    assert result.solved
+    assert result.values == [value for row in init_sudoku_solution for value in row]
+
+
+def test_solve_grid_timeout(hard_sudoku):
+    result = solve_grid(hard_sudoku, timeout=0)
+    assert not result.solved
+    assert 0 in result.values
+
+
+def test_worker_stats():
+    stats = WorkerStats()
+    assert stats.throughput == 0.0
+    stats.puzzles = 10
+    stats.seconds = 2.0
+    assert stats.throughput == 5.0
+
+
+@pytest.mark.parametrize('workers, chunksize', [(1, 7), (2, 4)])
+def test_solve_file(workers, chunksize):
+    expected = [solve_grid(matrix) for matrix in iter_grids('p096_sudoku.txt')]
+    batch = solve_file('p096_sudoku.txt', workers=workers, chunksize=chunksize)
+
+    assert batch.results == expected
+    assert all(result.solved for result in batch.results)
+    assert sum(worker.puzzles for worker in batch.workers.values()) == 50
+    assert 1 <= len(batch.workers) <= workers
+
+
+def test_solve_grids_invalid_workers(init_sudoku):
+    with pytest.raises(ValueError):
+        solve_grids([init_sudoku], workers=0)
+
+
+def test_solve_file_mmap(tmp_path):
+    path = tmp_path / 'grids.txt'
+    lines = [''.join(str(value) for row in matrix for value in row) for matrix in iter_grids('p096_sudoku.txt')]
+    path.write_text('\n'.join(lines[:10]) + '\n')
+
+    expected = [solve_grid(matrix) for matrix in iter_grids(str(path))]
+    for workers in (1, 2):
+        assert solve_file(str(path), workers=workers, chunksize=3, use_mmap=True).results == expected
+
+
+def test_solve_file_stats():
+    batch = solve_file('p096_sudoku.txt', workers=2, chunksize=10, collect_stats=True)
+    assert batch.stats.grids == 50
+    assert sum(technique.placements for technique in batch.stats.techniques.values()) == \
+        sum(value == 0 for matrix in iter_grids('p096_sudoku.txt') for row in matrix for value in row)
+    assert solve_file('p096_sudoku.txt', workers=1).stats is None
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_solve_grids_duplicate_given(init_sudoku, workers):
+    # головоломка с повторяющимся значением не прерывает решение остальных
+    duplicate = [1, 1] + [0] * 79
+    batch = solve_grids([[0] * 81, duplicate, init_sudoku], workers=workers, chunksize=2)
+    assert [result.solved for result in batch.results] == [True, False, True]
+    assert batch.results[1] == (duplicate, False, NO_SOLUTION)
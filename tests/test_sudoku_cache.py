@@ -0,0 +1,98 @@
+import random
+
+import pytest
+from sudoku_cache import SolutionCache, apply_transform, canonicalize, invert_transform
+from sudoku_parser import iter_grids
+from sudoku_solver import Sudoku
+
+
+def shuffle(grid, seed):
+    """Случайное преобразование головоломки, сохраняющее ее решение с точностью до симметрии."""
+    rnd = random.Random(seed)
+    values = [value for row in grid for value in row]
+    if rnd.random() < 0.5:
+        values = [values[9 * (pos % 9) + pos // 9] for pos in range(81)]
+    rows = [3 * band + i for band in rnd.sample(range(3), 3) for i in rnd.sample(range(3), 3)]
+    cols = [3 * stack + i for stack in rnd.sample(range(3), 3) for i in rnd.sample(range(3), 3)]
+    digits = [0] + rnd.sample(range(1, 10), 9)
+    return [[digits[values[9 * r + c]] for c in cols] for r in rows]
+
+
+def check_solution(grid, solution):
+    sudoku = Sudoku(grid)
+    sudoku.solve()
+    assert tuple(sudoku.values) == tuple(solution)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_canonicalize_invariant(init_sudoku, seed):
+    canonical, transform = canonicalize(init_sudoku)
+    assert canonicalize(shuffle(init_sudoku, seed))[0] == canonical
+
+
+def test_transform_roundtrip(init_sudoku):
+    canonical, transform = canonicalize(init_sudoku)
+    assert apply_transform(init_sudoku, transform) == canonical
+    assert invert_transform(canonical, transform) == tuple(value for row in init_sudoku for value in row)
+
+
+def test_cache_equivalent_puzzles():
+    cache = SolutionCache(maxsize=100)
+    grids = list(iter_grids('p096_sudoku.txt'))[:5]
+    for grid in grids:
+        check_solution(grid, cache.solve(grid))
+    assert cache.misses == 5
+
+    for seed, grid in enumerate(grids):
+        shuffled = shuffle(grid, seed)
+        check_solution(shuffled, cache.solve(shuffled))
+    assert cache.hits == 5
+    assert cache.misses == 5
+
+
+def test_cache_lru(init_sudoku, hard_sudoku):
+    cache = SolutionCache(maxsize=1)
+    cache.solve(init_sudoku)
+    cache.solve(hard_sudoku)
+    assert len(cache) == 1
+    assert cache.get(init_sudoku) is None
+    assert cache.get(hard_sudoku) is not None
+
+
+def test_cache_unsolvable():
+    matrix = [[0] * 9 for i in range(9)]
+    matrix[0][:8] = [1, 2, 3, 4, 5, 6, 7, 8]
+    matrix[1][8] = 9
+    cache = SolutionCache()
+    assert cache.solve(matrix) is None
+    assert cache.solve([1, 1] + [0] * 79) is None
+    assert len(cache) == 0
+
+
+def test_cache_persistent(tmp_path, init_sudoku):
+    path = str(tmp_path / 'cache')
+    with SolutionCache(path=path) as cache:
+        solution = cache.solve(init_sudoku)
+
+    with SolutionCache(path=path) as cache:
+        assert cache.get(shuffle(init_sudoku, 1)) is not None
+        assert cache.solve(init_sudoku) == solution
+        assert cache.hits == 1
+
+
+def test_cache_exact_and_sparse(monkeypatch, init_sudoku):
+    cache = SolutionCache()
+    solution = cache.solve(init_sudoku)
+
+    # повторный запрос и разреженная головоломка обходятся без приведения к каноническому виду
+    def fail(grid):
+        raise AssertionError('canonicalize')
+    monkeypatch.setattr('sudoku_cache.canonicalize', fail)
+    assert cache.solve(init_sudoku) == solution
+    assert cache.hits == 1
+
+    sparse = [0] * 81
+    sparse[:9] = range(1, 10)
+    check_solution(sparse, cache.solve(sparse))
+    assert cache.get(sparse) is not None
+    assert cache.misses == 2
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+from sudoku_generator import dig, generate, grade, main, random_solution
+from sudoku_solver import HOUSES, count_solutions
+
+
+def test_random_solution():
+    solution = random_solution(random.Random(1))
+    assert len(solution) == 81
+    for house in HOUSES:
+        assert {solution[pos] for pos in house} == {1, 2, 3, 4, 5, 6, 7, 8, 9}
+    assert solution == random_solution(random.Random(1))
+    assert solution != random_solution(random.Random(2))
+
+
+def test_random_solution_dead_end():
+    # при заполнении с этим зерном встречается тупик: противоречие приводит к перебору следующей цифры
+    solution = random_solution(random.Random(73))
+    for house in HOUSES:
+        assert {solution[pos] for pos in house} == {1, 2, 3, 4, 5, 6, 7, 8, 9}
+    assert count_solutions(list(solution)) == 1
+
+
+@pytest.mark.parametrize('symmetric', [True, False])
+def test_dig(symmetric):
+    rnd = random.Random(3)
+    solution = random_solution(rnd)
+    grid = dig(solution, rnd, symmetric)
+
+    assert count_solutions(grid) == 1
+    assert all(value in (0, solution[pos]) for pos, value in enumerate(grid))
+    if symmetric:
+        assert all(bool(grid[pos]) == bool(grid[80 - pos]) for pos in range(81))
+    # после удаления любого оставшегося значения (в симметричном случае - пары значений) решение перестает быть
+    # единственным
+    for pos in range(41 if symmetric else 81):
+        if grid[pos]:
+            removed = list(grid)
+            removed[pos] = 0
+            if symmetric:
+                removed[80 - pos] = 0
+            assert count_solutions(removed) == 2
+
+
+def test_grade(init_sudoku, hard_sudoku):
+    assert grade(init_sudoku) == 'easy'
+    assert grade(hard_sudoku) == 'expert'
+
+
+@pytest.mark.parametrize('target', ['easy', 'medium'])
+def test_generate(target):
+    puzzle = generate(target, random.Random(4))
+    assert puzzle.grade == target
+    assert grade(puzzle.grid) == target
+    assert count_solutions(puzzle.grid) == 1
+    assert all(value in (0, puzzle.solution[pos]) for pos, value in enumerate(puzzle.grid))
+
+
+def test_generate_unknown_grade():
+    with pytest.raises(ValueError):
+        generate('impossible')
+
+
+def test_main(capsys):
+    main(['--count', '3', '--seed', '5'])
+    lines = capsys.readouterr().out.split()
+    assert len(lines) == 3
+    for line in lines:
+        assert len(line) == 81
+        assert count_solutions([int(ch) for ch in line]) == 1
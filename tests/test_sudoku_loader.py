@@ -0,0 +1,85 @@
+import pytest
+from sudoku_loader import GridArray, load_grids
+from sudoku_parser import ParseError
+from sudoku_solver import Sudoku
+
+LINE = '003020600900305001001806400008102900700000008006708200002609500800203009005010300'
+
+
+@pytest.fixture
+def grids_file(tmp_path):
+    path = tmp_path / 'grids.txt'
+    path.write_bytes((LINE + '\n' + LINE.replace('0', '.') + '\r\n' + LINE).encode())
+    return str(path)
+
+
+def test_load_grids(grids_file, init_sudoku):
+    grids = load_grids(grids_file)
+    assert len(grids) == 3
+    assert len(grids.buffer) == 3 * 81
+    for grid in grids:
+        assert isinstance(grid, memoryview)
+        assert list(grid) == [value for row in init_sudoku for value in row]
+    assert grids[-1].obj is grids[0].obj
+
+
+def test_sudoku_from_buffer(grids_file, init_sudoku):
+    grids = load_grids(grids_file)
+    assert Sudoku(grids[1]).values == Sudoku(init_sudoku).values
+
+
+def test_load_empty(tmp_path):
+    path = tmp_path / 'empty.txt'
+    path.write_bytes(b'')
+    assert len(load_grids(str(path))) == 0
+
+
+@pytest.mark.parametrize('content, lineno', [
+    (LINE + '\n' + LINE[:-1] + '\n' + LINE, 2),
+    (LINE + '\n' + LINE + '\n' + LINE[:-1] + 'x', 3),
+    (LINE[:-1] + '\n' + LINE + '0\n', 1),
+    (LINE + '\r\n' + LINE[:40] + '\r' + LINE[41:] + '\r\n', 2),
+])
+def test_load_malformed(tmp_path, content, lineno):
+    path = tmp_path / 'bad.txt'
+    path.write_bytes(content.encode())
+    with pytest.raises(ParseError) as e:
+        load_grids(str(path))
+    assert e.value.lineno == lineno
+
+
+def test_load_blank_lines(tmp_path):
+    # пустые строки и комментарии пропускаются, как в sudoku_parser.iter_grids
+    path = tmp_path / 'grids.txt'
+    path.write_bytes((LINE + '\n\n# comment\n' + LINE + '\n\n').encode())
+    assert bytes(load_grids(str(path)).buffer) == bytes(int(ch) for ch in LINE * 2)
+
+    path.write_bytes((LINE + '\n\n' + LINE[:-1] + '\n\n').encode())
+    with pytest.raises(ParseError) as e:
+        load_grids(str(path))
+    assert e.value.lineno == 3
+
+
+def test_grid_array_invalid_size():
+    with pytest.raises(ValueError):
+        GridArray(bytes(80))
+
+
+def test_to_numpy(grids_file):
+    pytest.importorskip('numpy')
+    grids = load_grids(grids_file)
+    array = grids.to_numpy()
+    assert array.shape == (3, 81)
+    assert array[2, 2] == 3
+
+
+def test_load_grids_blocks(monkeypatch, tmp_path):
+    monkeypatch.setattr('sudoku_loader._BLOCK_SIZE', 100)
+    path = tmp_path / 'grids.txt'
+    path.write_text('\n'.join([LINE] * 10) + '\n' + LINE[:-1] + '\n')
+    with pytest.raises(ParseError) as e:
+        load_grids(str(path))
+    assert e.value.lineno == 11
+
+    path.write_text('\n'.join([LINE] * 10) + '\n')
+    assert bytes(load_grids(str(path)).buffer) == bytes(int(ch) for ch in LINE * 10)
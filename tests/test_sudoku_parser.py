@@ -0,0 +1,57 @@
+import io
+
+import pytest
+from sudoku_parser import ParseError, iter_grids, iter_puzzles
+
+EULER_RECORD = '''Grid 01
+003020600
+900305001
+001806400
+008102900
+700000008
+006708200
+002609500
+800203009
+005010300
+'''
+
+LINE_RECORD = '..3.2.6..9..3.5..1..18.64....81.29..7.......8..67.82....26.95..8..2.3..9..5.1.3..\n'
+
+
+def test_euler_format(init_sudoku):
+    puzzles = list(iter_puzzles(io.StringIO(EULER_RECORD)))
+    assert len(puzzles) == 1
+    assert puzzles[0].name == 'Grid 01'
+    assert puzzles[0].lineno == 1
+    assert puzzles[0].matrix == init_sudoku
+
+
+def test_line_format(init_sudoku):
+    source = io.BytesIO(('# comment\n\n' + LINE_RECORD + EULER_RECORD + LINE_RECORD.replace('.', '0')).encode())
+    puzzles = list(iter_puzzles(source))
+    assert [puzzle.lineno for puzzle in puzzles] == [3, 4, 14]
+    assert [puzzle.name for puzzle in puzzles] == [None, 'Grid 01', None]
+    assert all(puzzle.matrix == init_sudoku for puzzle in puzzles)
+
+
+def test_lazy():
+    grids = iter_grids(io.StringIO(LINE_RECORD + 'garbage\n'))
+    next(grids)
+    with pytest.raises(ParseError):
+        next(grids)
+
+
+def test_path():
+    assert len(list(iter_grids('p096_sudoku.txt'))) == 50
+
+
+@pytest.mark.parametrize('content, lineno', [
+    (EULER_RECORD.replace('700000008', '70000008'), 6),
+    (EULER_RECORD.replace('700000008', '70000x008'), 6),
+    ('\n'.join(EULER_RECORD.splitlines()[:5]), 6),
+    ('\n' + LINE_RECORD[:-2] + '\n', 2),
+])
+def test_malformed(content, lineno):
+    with pytest.raises(ParseError) as e:
+        list(iter_grids(io.StringIO(content)))
+    assert e.value.lineno == lineno
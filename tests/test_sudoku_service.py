@@ -0,0 +1,116 @@
+import asyncio
+import concurrent.futures
+
+import pytest
+from sudoku_batch import solve_grid
+from sudoku_parser import iter_grids
+from sudoku_service import SolverService
+
+
+class CountingExecutor(concurrent.futures.ThreadPoolExecutor):
+    """Исполнитель в текущем процессе, запоминающий размеры групп."""
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.batches = []
+
+    def submit(self, fn, grids, *args, **kwargs):
+        self.batches.append(len(grids))
+        return super().submit(fn, grids, *args, **kwargs)
+
+
+def run_service(coro_factory, **kwargs):
+    executor = CountingExecutor()
+
+    async def main():
+        async with SolverService(executor=executor, **kwargs) as service:
+            return await coro_factory(service)
+
+    try:
+        return asyncio.run(main()), executor
+    finally:
+        executor.shutdown()
+
+
+def test_solve_async(init_sudoku, init_sudoku_solution):
+    result, executor = run_service(lambda service: service.solve_async(init_sudoku))
+    assert result.solved
+    assert result.values == [value for row in init_sudoku_solution for value in row]
+
+
+def test_batching():
+    grids = list(iter_grids('p096_sudoku.txt'))[:10]
+
+    async def solve_all(service):
+        return await asyncio.gather(*(service.solve_async(grid) for grid in grids))
+
+    results, executor = run_service(solve_all, batch_size=4, batch_delay=0.05)
+    assert results == [solve_grid(grid) for grid in grids]
+    assert executor.batches == [4, 4, 2]
+
+
+def test_solve_stream():
+    grids = list(iter_grids('p096_sudoku.txt'))
+
+    async def stream(service):
+        return [result async for result in service.solve_stream(grids)]
+
+    results, executor = run_service(stream, max_concurrency=2, batch_size=3)
+    assert results == [solve_grid(grid) for grid in grids]
+    assert max(executor.batches) <= 3
+
+
+def test_timeout_cancels_queued_request(init_sudoku):
+    async def timed_out(service):
+        with pytest.raises(asyncio.TimeoutError):
+            await service.solve_async(init_sudoku, timeout=0.01)
+        return await service.solve_async(init_sudoku)
+
+    result, executor = run_service(timed_out, batch_delay=0.05)
+    assert result.solved
+    assert executor.batches == [1]
+
+
+def test_invalid_grid(init_sudoku):
+    async def solve_both(service):
+        return await asyncio.gather(service.solve_async([[10] * 9] * 9), service.solve_async(init_sudoku),
+                                    return_exceptions=True)
+
+    (error, result), executor = run_service(solve_both, batch_delay=0.05)
+    assert isinstance(error, ValueError)
+    assert result.solved
+    assert executor.batches == [2]
+
+
+def test_close_resolves_requests():
+    # при остановке сервиса каждый запрос получает результат либо отменяется, включая собираемые в группу и
+    # ожидающие свободного места в пуле
+    grids = list(iter_grids('p096_sudoku.txt'))[:7]
+    executor = CountingExecutor()
+
+    async def main():
+        service = SolverService(executor=executor, max_concurrency=1, batch_size=2, batch_delay=0.2)
+        tasks = [asyncio.ensure_future(service.solve_async(grid)) for grid in grids]
+        await asyncio.sleep(0.05)
+        await service.close()
+        done, pending = await asyncio.wait(tasks, timeout=1)
+        return tasks, pending
+
+    try:
+        tasks, pending = asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert not pending
+    assert all(task.cancelled() or task.result().solved for task in tasks)
+
+
+def test_process_pool(init_sudoku):
+    async def main():
+        async with SolverService(workers=2) as service:
+            return await service.solve_async(init_sudoku)
+
+    assert asyncio.run(main()).solved
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        SolverService(workers=1, queue_size=0)
@@ -1,20 +1,22 @@
+import json
 from typing import Set, Any
 
 import pytest
-from sudoku_solver import Cell, Sudoku
+from sudoku_parser import iter_grids
+from sudoku_solver import Cell, SolveStats, Sudoku, HOUSES, PEERS, CELL_HOUSES, FULL_MASK, ROW_OF, COLUMN_OF
+import sudoku_solver
+from sudoku_solver import count_solutions
 
 def get_sudoku_examples():
     """Читает из файла 50 головоломок судоку."""
-    examples = []
-    with open('p096_sudoku.txt', 'r') as f:
-        line = f.readline()
-        while line.startswith('Grid'):
-            matrix = [[int(ch) for ch in f.readline().strip()] for i in range(9)]
-            sudoku = Sudoku(matrix)
-            examples.append(sudoku)
-            line = f.readline()
+    return [Sudoku(matrix) for matrix in iter_grids('p096_sudoku.txt')]
+
 
-    return examples
+def pattern_grid(size, empty_every):
+    """Строит решенное судоку size x size по шаблону и опустошает каждую empty_every-ю ячейку."""
+    box = int(size ** 0.5)
+    return [[0 if (row * size + col) % empty_every == 0 else (box * (row % box) + row // box + col) % size + 1
+             for col in range(size)] for row in range(size)]
 
 
 class TestCell:
@@ -50,6 +52,63 @@ class TestCell:
         with pytest.raises(TypeError):
             result = Cell('fooo')
 
+    def test_choices_read_only(self):
+        result = Cell()
+        assert result.mask == 0b111111111
+        with pytest.raises(AttributeError):
+            result.choices.add(1)
+
+    def test_init_size(self):
+        result = Cell(16, 5, 10, size=16)
+        assert result.value == 16
+        assert (result.idx_row, result.idx_col, result.idx_square) == (5, 10, 6)
+        assert Cell(size=25).choices == set(range(1, 26))
+        with pytest.raises(ValueError):
+            Cell(17, size=16)
+
+class TestTopology:
+
+    def test_houses(self):
+        assert len(HOUSES) == 27
+        for house in HOUSES:
+            assert len(set(house)) == 9
+
+    @pytest.mark.parametrize('pos', [0, 40, 80])
+    def test_peers(self, pos):
+        assert len(PEERS[pos]) == 20
+        assert pos not in PEERS[pos]
+        assert set(PEERS[pos]) == {p for h in CELL_HOUSES[pos] for p in HOUSES[h]} - {pos}
+
+    @pytest.mark.parametrize('size', sudoku_solver.SIZES)
+    def test_sizes(self, size):
+        topology = sudoku_solver.topology(size)
+        assert topology is sudoku_solver.topology(size)
+        assert len(topology.houses) == 3 * size
+        for house in topology.houses:
+            assert sorted(house) == sorted(set(house)) and len(house) == size
+        assert len(topology.peers[0]) == 3 * size - 2 * topology.box - 1
+        for mask in (1, topology.full_mask, 0b1011 << (size - 4)):
+            assert topology.popcount[mask] == bin(mask).count('1')
+            assert topology.lowest_bit[mask] == (mask & -mask).bit_length() - 1
+
+    @pytest.mark.parametrize('size', sudoku_solver.SIZES)
+    def test_segments(self, size):
+        topology = sudoku_solver.topology(size)
+        assert len(topology.segments) == 2 * size * topology.box
+        for idx, house in enumerate(topology.houses):
+            for group in topology.house_segments[idx]:
+                assert sorted(pos for k in group for pos in topology.segments[k]) == sorted(house)
+        for k, segment in enumerate(topology.segments):
+            for house, rest in zip(topology.segment_houses[k], topology.segment_rests[k]):
+                assert set(topology.houses[house]) == set(segment) | set(rest)
+                assert not set(segment) & set(rest)
+
+    def test_unsupported_size(self):
+        with pytest.raises(ValueError):
+            sudoku_solver.topology(36)
+        with pytest.raises(ValueError):
+            Sudoku([[0] * 6] * 6)
+
 class TestSudoku:
 
     init_sudoku_columns = [
@@ -87,6 +146,23 @@ class TestSudoku:
                 assert sudoku.cells[i][j].value == init_sudoku[i][j]
                 assert sudoku.cells[i][j].choices == init_sudoku_choices[i][j], str(f'{i}, {j}')
 
+    def test_init_masks(self, init_sudoku, init_sudoku_choices):
+        sudoku = Sudoku(init_sudoku)
+        for i in range(9):
+            for j in range(9):
+                assert sudoku.values[i * 9 + j] == init_sudoku[i][j]
+                assert sudoku.masks[i * 9 + j] == sum(1 << (d - 1) for d in init_sudoku_choices[i][j])
+
+    def test_compact_storage(self, init_sudoku):
+        sudoku = Sudoku(init_sudoku)
+        assert not hasattr(sudoku, '__dict__')
+        assert sudoku._cells is None
+        cell = sudoku.cells[6][1]
+        assert not hasattr(cell, '__dict__')
+        assert (cell.pos, cell.idx_row, cell.idx_col, cell.idx_square) == (55, 6, 1, 6)
+        sudoku.set_value(6, 1, 4)
+        assert cell.value == 4 and sudoku.values[55] == 4
+
     @pytest.mark.parametrize('idx, expected', init_sudoku_columns)
     def test_column(self, init_sudoku, idx, expected):
         sudoku = Sudoku(init_sudoku)
@@ -110,6 +186,16 @@ class TestSudoku:
         assert sudoku.cells[1][1].choices == {2, 6, 7, 8}
         assert sudoku.cells[1][2].choices == {7}
 
+    def test_dirty_houses(self, init_sudoku):
+        sudoku = Sudoku(init_sudoku)
+        assert sudoku._dirty_houses('test') == list(range(27))
+        assert sudoku._dirty_houses('test') == []
+
+        sudoku.set_value(8, 5, 7)
+        # 7 исключена из ячеек (0, 5), (6, 4), (7, 4), (8, 1), (8, 7) и (8, 8)
+        assert sudoku._dirty_houses('test') == [0, 6, 7, 8, 10, 13, 14, 16, 17, 19, 24, 25, 26]
+        assert sudoku._singles == [41, 42, 75]
+
     def test_solve_naked_pairs(self):
 
         sudoku = Sudoku([
@@ -244,6 +330,19 @@ class TestSudoku:
         assert sudoku.cells[1][8].choices == {1, 5, 7}
         assert sudoku.cells[2][8].choices == {5, 9}
 
+    def test_solve_intersection_removal_restore(self, hard_sudoku):
+        # маски отрезков, сохраненные между проходами, пересчитываются после восстановления состояния
+        sudoku = Sudoku(hard_sudoku)
+        snapshot = sudoku.snapshot()
+        sudoku.solve_intersection_removal()
+        masks = list(sudoku.masks)
+
+        sudoku.restore(snapshot)
+        sudoku.solve_intersection_removal()
+        assert list(sudoku.masks) == masks
+        sudoku.solve()
+        assert sudoku.unsolved_cells == 0
+
     def test_solve_x_wing(self):
 
         sudoku = Sudoku([
@@ -286,6 +385,273 @@ class TestSudoku:
         assert sudoku.cells[8][3].choices == {3, 4, 5, 6, 8}
         assert sudoku.cells[8][8].choices == {3, 6, 8}
 
+    @pytest.mark.parametrize('method, cells', [
+        ('solve_naked_pairs', [0, 4]),
+        ('solve_naked_triples', [0, 4, 8]),
+        ('solve_naked_quads', [0, 2, 4, 8]),
+    ])
+    def test_solve_naked_subsets(self, method, cells):
+        sudoku = Sudoku([[0] * 9 for i in range(9)])
+        digits = (1 << len(cells)) - 1
+        # кандидаты ячеек подмножества - все сочетания цифр 1..size без одной
+        for i, pos in enumerate(cells):
+            sudoku._eliminate(pos, ~digits | (1 << i if len(cells) > 2 else 0))
+
+        getattr(sudoku, method)()
+        for pos in range(9):
+            if pos in cells:
+                assert sudoku.masks[pos] & ~digits == 0
+            else:
+                assert sudoku.masks[pos] == FULL_MASK & ~digits
+        assert sudoku.masks[9] == FULL_MASK
+
+    @pytest.mark.parametrize('method, cells', [
+        ('solve_hidden_pairs', [0, 4]),
+        ('solve_hidden_triples', [0, 4, 8]),
+        ('solve_hidden_quads', [0, 2, 4, 8]),
+    ])
+    def test_solve_hidden_subsets(self, method, cells):
+        sudoku = Sudoku([[0] * 9 for i in range(9)])
+        digits = (1 << len(cells)) - 1
+        for pos in range(9):
+            if pos not in cells:
+                sudoku._eliminate(pos, digits)
+
+        getattr(sudoku, method)()
+        for pos in range(9):
+            assert sudoku.masks[pos] == (digits if pos in cells else FULL_MASK & ~digits)
+
+    @pytest.mark.parametrize('method, lines', [
+        ('solve_x_wing', [0, 4]),
+        ('solve_swordfish', [0, 4, 8]),
+        ('solve_jellyfish', [0, 3, 4, 8]),
+    ])
+    def test_solve_fish(self, method, lines):
+        sudoku = Sudoku([[0] * 9 for i in range(9)])
+        covers = [1, 3, 6, 7][:len(lines)]
+        # цифра 1 в базовых строках возможна только в покрывающих столбцах
+        for idx_row in lines:
+            for idx_col in range(9):
+                if idx_col not in covers:
+                    sudoku._eliminate(9 * idx_row + idx_col, 1)
+
+        getattr(sudoku, method)()
+        for pos in range(81):
+            expected = (ROW_OF[pos] in lines) == (COLUMN_OF[pos] in covers)
+            assert bool(sudoku.masks[pos] & 1) == expected, pos
+
+    @staticmethod
+    def expected_positions(sudoku):
+        return [sum(1 << i for i, pos in enumerate(house) if sudoku.masks[pos] & (1 << digit))
+                for house in HOUSES for digit in range(9)]
+
+    def test_positions(self, init_sudoku, hard_sudoku):
+        for matrix in (init_sudoku, hard_sudoku):
+            sudoku = Sudoku(matrix)
+            assert list(sudoku._positions) == self.expected_positions(sudoku)
+            solved = Sudoku(matrix)
+            solved.solve()
+            sudoku.set_value(1, 1, solved.values[10])
+            sudoku.solve_naked_pairs()
+            sudoku.solve_hidden_pairs()
+            sudoku.solve_hidden_singles()
+            assert list(sudoku._positions) == self.expected_positions(sudoku)
+
+    def test_snapshot_restore(self, init_sudoku, init_sudoku_choices):
+        sudoku = Sudoku(init_sudoku)
+        cell = sudoku.cells[0][1]
+        snapshot = sudoku.snapshot()
+        assert len(snapshot.values) == len(snapshot.masks) == 81
+        assert len(snapshot.positions) == 27 * 9
+
+        sudoku.set_value(0, 0, 4)
+        sudoku.solve()
+        assert sudoku.unsolved_cells == 0
+
+        sudoku.restore(snapshot)
+        assert sudoku.unsolved_cells == 49
+        assert cell.value == 0
+        for i in range(9):
+            for j in range(9):
+                assert sudoku.cells[i][j].value == init_sudoku[i][j]
+                assert sudoku.cells[i][j].choices == init_sudoku_choices[i][j]
+
+        sudoku.set_value(0, 0, 5)
+        sudoku.solve(search=False)
+        sudoku.restore(snapshot)
+        sudoku.solve()
+        assert sudoku.unsolved_cells == 0
+        assert cell.value == 8
+
+    def test_solve_search(self, hard_sudoku):
+        sudoku = Sudoku(hard_sudoku)
+        sudoku.solve(search=False)
+        assert sudoku.unsolved_cells > 0
+
+        sudoku.solve()
+        assert sudoku.unsolved_cells == 0
+        for cells in sudoku.houses():
+            assert {cell.value for cell in cells} == {1, 2, 3, 4, 5, 6, 7, 8, 9}
+        for i in range(9):
+            for j in range(9):
+                if hard_sudoku[i][j]:
+                    assert sudoku.cells[i][j].value == hard_sudoku[i][j]
+
+    def test_solve_search_no_solution(self):
+        matrix = [[0] * 9 for i in range(9)]
+        matrix[0][:8] = [1, 2, 3, 4, 5, 6, 7, 8]
+        matrix[1][8] = 9
+        sudoku = Sudoku(matrix)
+        result = sudoku.solve()
+        assert result.status == sudoku_solver.NO_SOLUTION
+        assert sudoku.unsolved_cells > 0
+        assert sudoku.cells[0][8].value == 0
+        assert sudoku.cells[0][8].choices == set()
+
+    def test_contradiction_duplicate(self, init_sudoku):
+        matrix = [row[:] for row in init_sudoku]
+        matrix[0][0] = 3
+        with pytest.raises(sudoku_solver.Contradiction) as exc_info:
+            Sudoku(matrix)
+        assert isinstance(exc_info.value, ValueError)
+        assert (exc_info.value.digit, exc_info.value.house) == (3, 0)
+
+    def test_contradiction_no_place(self):
+        # девятке не осталось места в строке 0 и квадрате 2
+        matrix = [[0] * 9 for i in range(9)]
+        matrix[0][8] = 1
+        for idx_row, idx_col in [(1, 0), (4, 1), (7, 2), (2, 3), (5, 4), (8, 5), (3, 6), (6, 7)]:
+            matrix[idx_row][idx_col] = 9
+        sudoku = Sudoku(matrix)
+        result = sudoku.solve()
+        assert result.status == sudoku_solver.NO_SOLUTION
+        assert result.filled == 0
+        assert sudoku.count_solutions() == 0
+
+    def test_contradiction_on_elimination(self, init_sudoku):
+        sudoku = Sudoku(init_sudoku)
+        with pytest.raises(sudoku_solver.Contradiction):
+            sudoku.set_value(0, 0, 9)
+        with pytest.raises(sudoku_solver.Contradiction) as exc_info:
+            sudoku._eliminate(0, 0b11000)
+        assert exc_info.value.pos == 0
+        # в строке 4 двойка возможна только в ячейке 37
+        with pytest.raises(sudoku_solver.Contradiction) as exc_info:
+            sudoku._eliminate(37, 0b10)
+        assert (exc_info.value.digit, exc_info.value.house) == (2, 4)
+
+    def test_scheduler(self, init_sudoku, hard_sudoku):
+        calls = []
+
+        def recording(technique):
+            def wrapper(sudoku):
+                calls.append(technique.__name__)
+                technique(sudoku)
+            wrapper.__name__ = technique.__name__
+            return wrapper
+
+        scheduler = sudoku_solver.TechniqueScheduler(
+            [recording(Sudoku.solve_naked_singles), recording(Sudoku.solve_hidden_singles)])
+        result = Sudoku(init_sudoku).solve(search=False, scheduler=scheduler)
+        assert result.status == sudoku_solver.SOLVED
+        assert set(result.techniques) <= {'solve_naked_singles', 'solve_hidden_singles'}
+        # после результата более дорогого метода планировщик возвращается к самому дешевому
+        assert calls[0] == 'solve_naked_singles'
+        for previous, current in zip(calls, calls[1:]):
+            if previous == 'solve_hidden_singles':
+                assert current == 'solve_naked_singles'
+
+        result = Sudoku(hard_sudoku).solve(search=False, scheduler=scheduler)
+        assert result.status == sudoku_solver.UNSOLVED
+        assert Sudoku(hard_sudoku).solve(scheduler=scheduler).status == sudoku_solver.SOLVED
+
+    def test_scheduler_register(self, hard_sudoku):
+        scheduler = sudoku_solver.TechniqueScheduler.default()
+        assert len(scheduler.techniques) == 12 and len(scheduler.search_techniques) == 6
+
+        def solve_nothing(sudoku):
+            calls.append(sudoku)
+        calls = []
+        scheduler.register(solve_nothing, 2)
+        scheduler.register(Sudoku.solve_jellyfish, 3, search=False)
+        assert scheduler.techniques[2:4] == [solve_nothing, Sudoku.solve_jellyfish]
+        assert scheduler.search_techniques[:3] == [Sudoku.solve_naked_singles, Sudoku.solve_hidden_singles,
+                                                   solve_nothing]
+        assert len(sudoku_solver.TechniqueScheduler.default().techniques) == 12
+
+        result = Sudoku(hard_sudoku).solve(scheduler=scheduler, trace=True)
+        assert result.status == sudoku_solver.SOLVED
+        assert calls and 'solve_nothing' not in result.techniques
+
+    def test_solve_result(self, init_sudoku, hard_sudoku):
+        result = Sudoku(init_sudoku).solve()
+        assert result.status == sudoku_solver.SOLVED
+        assert result.filled == 49
+        assert 'solve_naked_singles' in result.techniques
+        assert result.elapsed > 0
+
+        sudoku = Sudoku(hard_sudoku)
+        result = sudoku.solve(search=False)
+        assert result.status == sudoku_solver.UNSOLVED
+        assert result.filled == 81 - 21 - sudoku.unsolved_cells
+
+    def test_solve_trace(self, init_sudoku, hard_sudoku):
+        assert Sudoku(init_sudoku).solve().trace is None
+
+        sudoku = Sudoku(init_sudoku)
+        result = sudoku.solve(trace=True)
+        assert result.trace
+        assert sum(step.placements for step in result.trace) == result.filled == 49
+        assert sum(step.eliminations for step in result.trace) == sudoku.eliminations
+        assert all(0 < step.houses < 1 << 27 for step in result.trace)
+        assert result.score == sum(sudoku_solver.TECHNIQUE_WEIGHTS[step.technique] for step in result.trace)
+
+        hard = Sudoku(hard_sudoku).solve(trace=True)
+        assert any(step.technique == 'search' for step in hard.trace)
+        assert hard.score > result.score
+        assert Sudoku(hard_sudoku).grade() == hard.score
+
+    @pytest.mark.parametrize('budget, status', [
+        ({'max_nodes': 3}, sudoku_solver.NODE_LIMIT),
+        ({'max_rounds': 5}, sudoku_solver.ROUND_LIMIT),
+        ({'timeout': 0}, sudoku_solver.TIMEOUT),
+    ])
+    def test_solve_budget(self, hard_sudoku, budget, status):
+        logical = Sudoku(hard_sudoku)
+        logical.solve(search=False)
+
+        sudoku = Sudoku(hard_sudoku)
+        result = sudoku.solve(**budget)
+        assert result.status == status
+        assert sudoku.unsolved_cells > 0
+        # предположения, сделанные при поиске, не остаются в головоломке
+        for pos in range(81):
+            assert sudoku.values[pos] in (0, logical.values[pos])
+
+        sudoku.solve()
+        assert sudoku.unsolved_cells == 0
+
+    def test_count_solutions(self, init_sudoku, hard_sudoku):
+        assert count_solutions(init_sudoku) == 1
+        assert count_solutions(hard_sudoku) == 1
+        assert count_solutions([0] * 81) == 2
+        assert count_solutions([0] * 81, limit=5) == 5
+
+        matrix = [row[:] for row in hard_sudoku]
+        matrix[0][0] = 0
+        assert count_solutions(matrix) == 2
+
+        # повтор значения в строке
+        matrix = [row[:] for row in init_sudoku]
+        matrix[0][0] = 3
+        assert count_solutions(matrix) == 0
+
+    def test_count_solutions_keeps_state(self, hard_sudoku):
+        sudoku = Sudoku(hard_sudoku)
+        snapshot = sudoku.snapshot()
+        assert sudoku.count_solutions() == 1
+        assert sudoku.snapshot() == snapshot
+
     @pytest.mark.parametrize('sudoku', examples_for_full_testing)
     def test_full_solving(self, sudoku):
         sudoku.solve()
@@ -296,4 +662,95 @@ class TestSudoku:
             for cell in cells:
                 assert cell.value in reminder
                 reminder.remove(cell.value)
-            assert len(reminder) == 0
\ No newline at end of file
+            assert len(reminder) == 0
+
+    @pytest.mark.parametrize('size, empty_every', [(4, 2), (16, 2), (25, 3)])
+    def test_solve_sizes(self, size, empty_every):
+        sudoku = Sudoku(pattern_grid(size, empty_every))
+        assert sudoku.size == size
+        assert sudoku.solve().status == sudoku_solver.SOLVED
+        for house in sudoku.topology.houses:
+            assert sorted(sudoku.values[pos] for pos in house) == list(range(1, size + 1))
+
+    def test_init_flat_sizes(self):
+        grid = pattern_grid(4, 3)
+        assert Sudoku([value for row in grid for value in row]).size == 4
+        assert Sudoku(pattern_grid(16, 3)).size == 16
+        with pytest.raises(ValueError):
+            Sudoku([[0] * 4] * 4 + [[0] * 4])
+
+    def test_from_string(self, init_sudoku, hard_sudoku):
+        for grid in (init_sudoku, hard_sudoku):
+            flat = [value for row in grid for value in row]
+            text = ''.join(str(value) if value else '.' for value in flat)
+            expected = Sudoku(grid)
+            for sudoku in (Sudoku.from_string(text), Sudoku.from_bytes(text.encode()),
+                           Sudoku.from_bytes(memoryview(text.replace('.', '0').encode()), validate=False)):
+                assert sudoku.values == expected.values
+                assert sudoku.masks == expected.masks
+                assert sudoku._positions == expected._positions
+                assert sudoku.unsolved_cells == expected.unsolved_cells
+        assert Sudoku.from_string('1.3..2.4.4.2.1.3').size == 4
+
+    @pytest.mark.parametrize('text', ['1' * 80, 'x' + '0' * 80, 'я' + '0' * 80, '5' + '0' * 15])
+    def test_from_string_invalid(self, text):
+        with pytest.raises(ValueError):
+            Sudoku.from_string(text)
+
+    def test_from_string_trusted(self):
+        # без проверки недопустимые символы читаются как пустые ячейки
+        assert Sudoku.from_bytes(b'\xff' + b'0' * 80, validate=False).values == bytearray(81)
+        sudoku = Sudoku.from_string('x' + '1' + '0' * 79, validate=False)
+        assert sudoku.values[:2] == bytearray([0, 1])
+        assert Sudoku.from_string('9234' + '0' * 12, validate=False).values[0] == 0
+
+    def test_repr_sizes(self):
+        assert repr(Sudoku(pattern_grid(4, 5))) == (
+            '---+---+---+---\n'
+            ' X   2 | 3   4 \n'
+            '       +       \n'
+            ' 3   X | 1   2 \n'
+            '---+---+---+---\n'
+            ' 2   3 | X   1 \n'
+            '       +       \n'
+            ' 4   1 | 2   X \n'
+            '---+---+---+---\n'
+        )
+        assert repr(Sudoku(pattern_grid(16, 2))).split('\n')[1].startswith('  X    2    X    4 |  X    6 ')
+
+
+class TestSolveStats:
+
+    def test_disabled(self, init_sudoku):
+        sudoku = Sudoku(init_sudoku)
+        assert sudoku.stats is None
+        sudoku.solve()
+        assert sudoku.eliminations > 0
+
+    def test_collect(self, init_sudoku, hard_sudoku):
+        stats = SolveStats()
+        for matrix in (init_sudoku, hard_sudoku):
+            Sudoku(matrix, stats).solve()
+
+        assert stats.grids == 2
+        assert stats.search_nodes > 0
+        assert stats.escalations > 0
+        assert set(stats.techniques) == {'solve_naked_pairs', 'solve_hidden_pairs', 'solve_naked_singles',
+                                         'solve_hidden_singles', 'solve_intersection_removal', 'solve_x_wing',
+                                         'solve_naked_triples', 'solve_hidden_triples', 'solve_swordfish',
+                                         'solve_naked_quads', 'solve_hidden_quads', 'solve_jellyfish'}
+        assert stats.techniques['solve_naked_singles'].placements >= 49
+        assert all(technique.calls > 0 for technique in stats.techniques.values())
+
+    def test_merge_and_export(self, init_sudoku):
+        first = SolveStats()
+        Sudoku(init_sudoku, first).solve()
+        second = SolveStats()
+        second.merge(first)
+        second.merge(first)
+
+        exported = json.loads(second.to_json())
+        assert exported['grids'] == 2
+        naked_singles = exported['techniques']['solve_naked_singles']
+        assert naked_singles['placements'] == 2 * first.techniques['solve_naked_singles'].placements
+        assert exported == second.as_dict()
@@ -0,0 +1,74 @@
+import pytest
+from sudoku_batch import solve_file, solve_grid
+from sudoku_parser import iter_grids
+from sudoku_solver import NO_SOLUTION, SOLVED, TIMEOUT
+from sudoku_store import ResultStore, grid_key
+
+
+def test_grid_key(init_sudoku):
+    key = grid_key(init_sudoku)
+    assert len(key) == 81
+    assert key == ''.join(str(value) for row in init_sudoku for value in row)
+    assert grid_key([value for row in init_sudoku for value in row]) == key
+    assert grid_key(bytes(value for row in init_sudoku for value in row)) == key
+
+
+def test_put_get(tmp_path, init_sudoku, init_sudoku_solution):
+    key = grid_key(init_sudoku)
+    values = [value for row in init_sudoku_solution for value in row]
+    with ResultStore(str(tmp_path / 'results.db')) as store:
+        assert store.get(key) is None
+        assert key not in store
+        store.put(key, values, SOLVED, 0.5)
+
+    with ResultStore(str(tmp_path / 'results.db')) as store:
+        assert len(store) == 1
+        assert key in store
+        result = store.get(key)
+        assert result.values == values
+        assert result.status == SOLVED
+        assert result.elapsed == 0.5
+
+        store.put(key, values, TIMEOUT)
+        assert len(store) == 1
+        assert store.get(key).status == TIMEOUT
+
+
+def test_put_many_transaction():
+    grids = list(iter_grids('p096_sudoku.txt'))
+    keys = [grid_key(grid) for grid in grids]
+    with ResultStore(':memory:') as store:
+        store.put_many((key, solve_grid(grid).values, SOLVED, 0.0) for key, grid in zip(keys, grids))
+        found = store.get_many(keys + ['0' * 81])
+        assert len(store) == len(found) == len(set(keys))
+        assert [found[key].values for key in keys] == [solve_grid(grid).values for grid in grids]
+
+        # ошибка в записи откатывает всю группу
+        with pytest.raises(TypeError):
+            store.put_many([('1' * 81, [0] * 81, NO_SOLUTION, 0.0), ('2' * 81, None, SOLVED, 0.0)])
+        assert len(store) == len(set(keys))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_solve_file_store(tmp_path, workers):
+    path = tmp_path / 'grids.txt'
+    lines = [''.join(str(value) for row in matrix for value in row) for matrix in iter_grids('p096_sudoku.txt')]
+    path.write_text('\n'.join(lines[:10]) + '\n')
+    expected = solve_file(str(path), workers=1).results
+
+    with ResultStore(str(tmp_path / 'results.db')) as store:
+        # часть головоломок уже решена, одна прервана по времени и решается заново
+        store.put_many((line, result.values, result.status, 0.0) for line, result in zip(lines[:4], expected))
+        store.put(lines[4], expected[4].values, TIMEOUT)
+
+        batch = solve_file(str(path), workers=workers, chunksize=3, store=store)
+        assert batch.results == expected
+        assert batch.stored == 4
+        assert sum(worker.puzzles for worker in batch.workers.values()) == 6
+        assert len(store) == 10
+        assert store.get(lines[4]).status == SOLVED
+
+        batch = solve_file(str(path), workers=workers, chunksize=3, store=store)
+        assert batch.results == expected
+        assert batch.stored == 10
+        assert batch.workers == {}
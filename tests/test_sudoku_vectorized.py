@@ -0,0 +1,53 @@
+import pytest
+
+numpy = pytest.importorskip('numpy')
+
+from sudoku_parser import iter_grids
+from sudoku_solver import Sudoku
+from sudoku_vectorized import INVALID, SOLVED, UNSOLVED, propagate, solve_batch
+
+
+def test_propagate_singles(init_sudoku, init_sudoku_solution):
+    values, status = propagate([init_sudoku])
+    assert status.tolist() == [SOLVED]
+    assert values.reshape(9, 9).tolist() == init_sudoku_solution
+
+
+def test_propagate_stalled(hard_sudoku):
+    values, status = propagate(numpy.array([hard_sudoku]))
+    assert status.tolist() == [UNSOLVED]
+    sudoku = Sudoku(hard_sudoku)
+    sudoku.solve()
+    for value, expected in zip(values[0].tolist(), sudoku.values):
+        assert value in (0, expected)
+
+
+def test_propagate_invalid(init_sudoku):
+    grid = [row[:] for row in init_sudoku]
+    grid[0][0] = 3
+    values, status = propagate([grid, init_sudoku])
+    assert status.tolist() == [INVALID, SOLVED]
+    assert values[0].reshape(9, 9).tolist() == grid
+
+
+def test_propagate_invalid_value():
+    with pytest.raises(ValueError):
+        propagate([[10] * 81])
+
+
+def test_solve_batch():
+    grids = list(iter_grids('p096_sudoku.txt'))
+    values, status = solve_batch(grids)
+    assert (status == SOLVED).all()
+    for matrix, solution in zip(grids, values):
+        sudoku = Sudoku(matrix)
+        sudoku.solve()
+        assert solution.tolist() == list(sudoku.values)
+
+
+def test_solve_batch_no_solution(hard_sudoku):
+    # одиночки не находят противоречия, но поиск доказывает, что решения нет
+    grid = [int(ch) for ch in '820000000003600000070090200050007000000045700000100030001000068008500010090000400']
+    assert propagate([grid]).status[0] == UNSOLVED
+    values, status = solve_batch([grid, [value for row in hard_sudoku for value in row]])
+    assert status.tolist() == [INVALID, SOLVED]